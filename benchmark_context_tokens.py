@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Prompt size comparison: assistant turns stored as rendered Telegram HTML
+(the previous behaviour) versus stored as the raw model output.
+
+Counts approximate input tokens of the history sent to the API for a few
+sample conversations.
+
+Usage: python benchmark_context_tokens.py
+"""
+
+from context_builder import estimate_message_tokens
+from telegram_format import render_telegram_html
+
+SAMPLE_CONVERSATIONS = {
+    "coder": [
+        ("user", "How do I read a file line by line in Python?"),
+        ("assistant", "Use a **context manager** so the file is closed for you:\n\n```python\nwith open(\"data.txt\") as f:\n    for line in f:\n        print(line.rstrip())\n```\n\nIterating the file object is *lazy*, so even large files use little memory."),
+        ("user", "And only lines where a < b?"),
+        ("assistant", "Filter inside the loop, e.g. `if a < b and line:`. For numeric columns parse first:\n\n```python\nfor line in f:\n    a, b = map(int, line.split(\",\"))\n    if a < b:\n        print(a, b)\n```\n\nSee [the docs](https://docs.python.org/3/tutorial/inputoutput.html) for __more__ on files."),
+    ],
+    "analyst": [
+        ("user", "Summarize these numbers: revenue up 12%, costs up 20%."),
+        ("assistant", "**Key takeaway:** margins are shrinking.\n\n* Revenue grew **12%**\n* Costs grew **20%**\n\nBecause costs > revenue growth, profit falls unless `pricing` or *volume* changes. Watch the Q3 & Q4 trend."),
+        ("user", "What should we do?"),
+        ("assistant", "Three options:\n\n1. **Raise prices** by 3-5% where demand is inelastic\n2. **Cut costs**: renegotiate the top *5* supplier contracts\n3. **Grow volume** with existing capacity\n\nI would start with __option 2__, it has the lowest risk & fastest payback."),
+    ],
+    "supportive_friend": [
+        ("user", "I had a rough day at work."),
+        ("assistant", "I'm sorry to hear that. Do you want to talk about what happened? Sometimes it helps to just let it out."),
+        ("user", "My manager criticized my presentation in front of everyone."),
+        ("assistant", "That sounds really *embarrassing* and unfair. Feedback like that should happen **in private**. You worked hard on it, and one comment doesn't define your skills."),
+    ],
+}
+
+
+def history_tokens(conversation, render: bool) -> int:
+    """Approximate input tokens of a conversation, optionally with HTML-rendered assistant turns"""
+    total = 0
+    for role, content in conversation:
+        if render and role == "assistant":
+            content = render_telegram_html(content)
+        total += estimate_message_tokens({"role": role, "content": content})
+    return total
+
+
+def main():
+    print("🧮 History tokens per request: stored HTML vs raw model output")
+    print(f"{'conversation':>18} {'HTML':>6} {'raw':>6} {'saved':>7}")
+    total_before = total_after = 0
+    for name, conversation in SAMPLE_CONVERSATIONS.items():
+        before = history_tokens(conversation, render=True)
+        after = history_tokens(conversation, render=False)
+        total_before += before
+        total_after += after
+        print(f"{name:>18} {before:>6} {after:>6} {(before - after) / before:>6.1%}")
+    print(f"{'total':>18} {total_before:>6} {total_after:>6} {(total_before - total_after) / total_before:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the Markdown -> Telegram HTML renderer
+Compares the single-pass renderer with the previous regex/replace pipeline
+on large (4-16 KB) responses.
+
+Usage: python benchmark_formatting.py
+"""
+
+import re
+import timeit
+from telegram_format import render_telegram_html
+
+
+def legacy_format_for_telegram(text: str) -> str:
+    """The previous _format_for_telegram implementation, kept for comparison"""
+    if not text:
+        return text
+    text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', text)
+    text = re.sub(r'\*(.*?)\*', r'<i>\1</i>', text)
+    text = re.sub(r'`(.*?)`', r'<code>\1</code>', text)
+    text = re.sub(r'__(.*?)__', r'<u>\1</u>', text)
+    text = re.sub(r'\n\s*\n', '\n\n', text)
+    text = text.strip()
+    text = text.replace('\n', '\n')
+    text = text.replace('&', '&amp;')
+    text = text.replace('<', '&lt;')
+    text = text.replace('>', '&gt;')
+    text = text.replace('&lt;b&gt;', '<b>')
+    text = text.replace('&lt;/b&gt;', '</b>')
+    text = text.replace('&lt;i&gt;', '<i>')
+    text = text.replace('&lt;/i&gt;', '</i>')
+    text = text.replace('&lt;code&gt;', '<code>')
+    text = text.replace('&lt;/code&gt;', '</code>')
+    text = text.replace('&lt;u&gt;', '<u>')
+    text = text.replace('&lt;/u&gt;', '</u>')
+    return text
+
+
+PROSE_PARAGRAPH = (
+    "Caching works best when the same inputs repeat often. In a chat bot that usually means the first "
+    "message after a reset, because later turns carry a unique history. Keep the cache small, expire "
+    "entries after a few minutes, and measure the hit ratio before tuning anything else. **Tip:** "
+    "skip caching for sensitive roles.\n\n"
+)
+
+MARKUP_PARAGRAPH = (
+    "Here is **an important point** about *performance* when you call `fetch_data()` in a loop.\n"
+    "Remember that a < b && c > d, and see [the docs](https://example.com/docs?a=1&b=2) for __details__.\n\n"
+    "```python\nfor item in items:\n    if item.value < limit:\n        print(f\"**{item}**\")\n```\n\n"
+)
+
+
+def make_response(paragraph: str, size: int) -> str:
+    """Build a markdown response of roughly size bytes"""
+    repeats = size // len(paragraph.encode("utf-8")) + 1
+    return (paragraph * repeats)[:size]
+
+
+def best_time(func, number: int = 50) -> float:
+    """Best average time per call over several repeats"""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    print("📏 Markdown -> Telegram HTML benchmark")
+    print(f"{'sample':>8} {'size':>6} {'legacy (µs)':>12} {'single-pass (µs)':>17} {'speedup':>8}")
+    for name, paragraph in (("prose", PROSE_PARAGRAPH), ("markup", MARKUP_PARAGRAPH)):
+        for size in (4 * 1024, 8 * 1024, 16 * 1024):
+            text = make_response(paragraph, size)
+            legacy = best_time(lambda: legacy_format_for_telegram(text))
+            single_pass = best_time(lambda: render_telegram_html(text))
+            print(f"{name:>8} {size // 1024:>4}KB {legacy * 1e6:>12.1f} {single_pass * 1e6:>17.1f} {legacy / single_pass:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
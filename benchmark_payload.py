@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for building chat completion request bodies
+Compares copying the history into a payload dict and JSON-encoding it on
+every request (the previous path) with concatenating pre-encoded messages,
+at 20 and 200 messages of history. Also times response decoding.
+
+Usage: python benchmark_payload.py
+"""
+
+import json
+import timeit
+from payload_codec import JSON_CODEC, build_request_body, encode_message, loads
+
+SYSTEM_PROMPT = (
+    "You are an expert coder specializing in web development. give answers in short and only "
+    "give detailed only if asked by user, made by Glitch Artist."
+)
+
+USER_TEXT = "Why does my fetch() call return a pending Promise instead of the data? I await it in a loop."
+ASSISTANT_TEXT = (
+    "Because `fetch()` resolves to a **Response**, not the body. Await the body too:\n\n"
+    "```js\nconst res = await fetch(url);\nconst data = await res.json();\n```\n\n"
+    "Inside loops prefer `for...of` with `await`, or collect promises and use `Promise.all` — "
+    "`forEach` ignores returned promises."
+)
+
+SAMPLE_RESPONSE = json.dumps({
+    "id": "chatcmpl-123",
+    "object": "chat.completion",
+    "model": "llama3.1-8b",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": ASSISTANT_TEXT * 4}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1200, "completion_tokens": 400, "total_tokens": 1600}
+}).encode("utf-8")
+
+
+def make_history(size: int):
+    """History messages as stored by UserManager, including their pre-encoded form"""
+    history = []
+    for index in range(size):
+        role = "user" if index % 2 == 0 else "assistant"
+        content = USER_TEXT if role == "user" else ASSISTANT_TEXT
+        history.append({"role": role, "content": content, "encoded": encode_message(role, content)})
+    return history
+
+
+def legacy_request_body(messages, system_prompt: str, model: str) -> bytes:
+    """The previous path: copy every message into a payload dict, then JSON-encode it"""
+    api_messages = [{"role": "system", "content": system_prompt}]
+    for msg in messages:
+        api_messages.append({
+            "role": "user" if msg["role"] == "user" else "assistant",
+            "content": msg["content"]
+        })
+    payload = {"model": model, "messages": api_messages, "max_tokens": 1000, "temperature": 0.7, "stream": False}
+    return json.dumps(payload).encode("utf-8")
+
+
+def best_time(func, number: int = 500) -> float:
+    """Best average time per call over several repeats"""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    print(f"📦 Request body benchmark (JSON codec: {JSON_CODEC})")
+    print(f"{'messages':>9} {'legacy (µs)':>12} {'pre-encoded (µs)':>17} {'speedup':>8}")
+    for size in (20, 200):
+        history = make_history(size)
+        legacy = best_time(lambda: legacy_request_body(history, SYSTEM_PROMPT, "llama3.1-8b"))
+        pre_encoded = best_time(lambda: build_request_body(history, SYSTEM_PROMPT, "llama3.1-8b", 1000, 0.7, False))
+        print(f"{size:>9} {legacy * 1e6:>12.1f} {pre_encoded * 1e6:>17.1f} {legacy / pre_encoded:>7.2f}x")
+
+    stdlib = best_time(lambda: json.loads(SAMPLE_RESPONSE))
+    codec = best_time(lambda: loads(SAMPLE_RESPONSE))
+    print(f"\n🔍 Response decoding: json {stdlib * 1e6:.1f} µs, {JSON_CODEC} {codec * 1e6:.1f} µs ({stdlib / codec:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Memory benchmark for user sessions
+Compares the previous plain-dict sessions (a list of message dicts per
+user) with slotted UserSession objects and their ring-buffer history,
+at 100k sessions. Message texts are shared between sessions, so the
+numbers show the per-session and per-message overhead.
+
+Usage: python benchmark_sessions.py
+"""
+
+import gc
+import tracemalloc
+from config import DEFAULT_ROLE
+from context_builder import estimate_message_tokens
+from payload_codec import encode_message
+from user_manager import UserManager
+
+SESSIONS = 100_000
+TEXTS = {
+    "user": "Can you help me plan my week?",
+    "assistant": "Of course! What are your main goals for this week?",
+}
+
+
+def legacy_sessions(messages_per_session: int):
+    """Sessions as previously stored by UserManager"""
+    users = {}
+    for user_id in range(SESSIONS):
+        user = users[user_id] = {
+            "role": DEFAULT_ROLE,
+            "conversation": [],
+            "name": None,
+            "partner_name": None,
+            "summary": None
+        }
+        for index in range(messages_per_session):
+            role = "user" if index % 2 == 0 else "assistant"
+            user["conversation"].append({
+                "role": role,
+                "content": TEXTS[role],
+                "timestamp": None,
+                "encoded": encode_message(role, TEXTS[role]),
+                "tokens": estimate_message_tokens({"content": TEXTS[role]})
+            })
+    return users
+
+
+def slotted_sessions(messages_per_session: int):
+    """Sessions as stored by UserManager now"""
+    manager = UserManager()
+    for user_id in range(SESSIONS):
+        manager.get_user(user_id)
+        for index in range(messages_per_session):
+            role = "user" if index % 2 == 0 else "assistant"
+            manager.add_message(user_id, role, TEXTS[role])
+    return manager
+
+
+def measure(build, messages_per_session: int) -> int:
+    """Bytes allocated by build() that are still alive afterwards"""
+    gc.collect()
+    tracemalloc.start()
+    data = build(messages_per_session)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return size
+
+
+def main():
+    print(f"🧠 Session memory at {SESSIONS:,} sessions")
+    print(f"{'messages':>9} {'dict (MB)':>10} {'slotted (MB)':>13} {'saved':>7} {'per session (B)':>18}")
+    for messages_per_session in (0, 6, 20):
+        legacy = measure(legacy_sessions, messages_per_session)
+        slotted = measure(slotted_sessions, messages_per_session)
+        print(
+            f"{messages_per_session:>9} {legacy / 2**20:>10.1f} {slotted / 2**20:>13.1f} "
+            f"{(legacy - slotted) / legacy:>6.1%} {legacy // SESSIONS:>8} -> {slotted // SESSIONS:<8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
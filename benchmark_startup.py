@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Warm restart benchmark
+Times how long a restarted bot needs before it can serve its first update
+with 300k saved sessions: mapping the binary snapshot and faulting in
+only the first user's session, against restoring only that user's row
+from SQLite on access (the bot's path without a snapshot). Reloading
+every session from SQLite row by row is shown for reference. Also
+reports snapshot size and write time, with and without compression.
+
+Usage: python benchmark_startup.py
+"""
+
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+from session_snapshot import SessionSnapshotter, write_snapshot
+from session_store import SQLiteSessionStore
+from user_manager import UserManager, UserSession
+
+SESSIONS = 300_000
+MESSAGES_PER_SESSION = 6
+TEXTS = {
+    "user": "Can you help me plan my week?",
+    "assistant": "Of course! What are your main goals for this week?",
+}
+
+
+def make_records():
+    """Serialized sessions as the session store and snapshots hold them"""
+    manager = UserManager()
+    for index in range(MESSAGES_PER_SESSION):
+        role = "user" if index % 2 == 0 else "assistant"
+        manager.add_message(0, role, TEXTS[role])
+    data = manager.users[0].to_bytes()
+    return [(user_id, data) for user_id in range(SESSIONS)]
+
+
+def eager_sqlite_start(path: str) -> float:
+    """Load every session from SQLite before serving"""
+    started = time.perf_counter()
+    store = SQLiteSessionStore(path)
+    manager = UserManager(max_sessions=SESSIONS + 1)
+    for user_id, data in store._reader.execute("SELECT user_id, data FROM sessions"):
+        manager.users[user_id] = UserSession.from_bytes(data)
+    manager.get_conversation(SESSIONS // 2)
+    elapsed = time.perf_counter() - started
+    store.close()
+    return elapsed
+
+
+def lazy_sqlite_start(path: str) -> float:
+    """Restore the first user's session from SQLite on first access"""
+    started = time.perf_counter()
+    store = SQLiteSessionStore(path)
+    manager = UserManager(restore=lambda user_id: UserSession.from_bytes(store.load(user_id)))
+    manager.get_conversation(SESSIONS // 2)
+    elapsed = time.perf_counter() - started
+    store.close()
+    return elapsed
+
+
+def lazy_snapshot_start(path: str) -> float:
+    """Map the clean snapshot (marking it as loaded) and fault in the first user's session only"""
+    # Loading clears the clean flag, so every run starts from a fresh copy
+    shutil.copyfile(path, path + ".run")
+    with open(path + ".run", "rb") as f:
+        os.fsync(f.fileno())
+    started = time.perf_counter()
+    manager = UserManager()
+    with contextlib.redirect_stdout(io.StringIO()):
+        snapshotter = SessionSnapshotter(manager, path + ".run", 300, False, require_clean=True, periodic=False)
+    manager.get_conversation(SESSIONS // 2)
+    elapsed = time.perf_counter() - started
+    snapshotter.reader.close()
+    return elapsed
+
+
+def main():
+    records = make_records()
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "sessions.db")
+        store = SQLiteSessionStore(db_path)
+        store.save_many(dict(records))
+        store.close()
+
+        print(f"📸 Snapshot of {SESSIONS:,} sessions ({MESSAGES_PER_SESSION} messages each)")
+        for compress in (False, True):
+            path = os.path.join(directory, f"sessions-{compress}.snapshot")
+            started = time.perf_counter()
+            size = write_snapshot(path, list(records), compress, clean=True)
+            os.replace(path + ".tmp", path)
+            label = "zlib" if compress else "raw"
+            print(f"  {label:>4}: {size / 2**20:6.1f} MB written in {time.perf_counter() - started:.2f} s")
+
+        print("\n⚡ Time to first served update")
+        eager = eager_sqlite_start(db_path)
+        print(f"  SQLite, load all rows:     {eager * 1000:9.1f} ms (reference)")
+        lazy_sqlite = min(lazy_sqlite_start(db_path) for _ in range(5))
+        print(f"  SQLite, restore on access: {lazy_sqlite * 1000:9.1f} ms")
+        lazy = min(lazy_snapshot_start(os.path.join(directory, "sessions-False.snapshot")) for _ in range(5))
+        print(f"  snapshot, mmap lazily:     {lazy * 1000:9.1f} ms ({lazy / lazy_sqlite:.1f}x the time of restore on access)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,296 +1,873 @@
-import requests
-import json
-import re
-from config import CEREBRAS_API_KEY, CEREBRAS_API_URL, CEREBRAS_MODELS_URL
-
-class CerebrasClient:
-    def __init__(self):
-        self.api_key = CEREBRAS_API_KEY
-        self.api_url = CEREBRAS_API_URL
-        self.models_url = CEREBRAS_MODELS_URL
-        self.current_model = "cerebras-1.3b-chat"  # Default model
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        # Track recent responses to avoid repetition
-        self.recent_responses = []
-    
-    def _format_for_telegram(self, text: str) -> str:
-        """
-        Format text for Telegram messages, handling special characters and formatting
-        """
-        if not text:
-            return text
-        
-        # Remove any existing markdown that might cause issues
-        text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', text)  # Convert **bold** to <b>bold</b>
-        text = re.sub(r'\*(.*?)\*', r'<i>\1</i>', text)      # Convert *italic* to <i>italic</i>
-        text = re.sub(r'`(.*?)`', r'<code>\1</code>', text)  # Convert `code` to <code>code</code>
-        text = re.sub(r'__(.*?)__', r'<u>\1</u>', text)      # Convert __underline__ to <u>underline</u>
-        
-        # Clean up extra whitespace and newlines
-        text = re.sub(r'\n\s*\n', '\n\n', text)  # Remove multiple empty lines
-        text = text.strip()
-        
-        # Ensure proper line breaks
-        text = text.replace('\n', '\n')
-        
-        # Escape HTML special characters
-        text = text.replace('&', '&amp;')
-        text = text.replace('<', '&lt;')
-        text = text.replace('>', '&gt;')
-        
-        # Re-apply our HTML formatting
-        text = text.replace('&lt;b&gt;', '<b>')
-        text = text.replace('&lt;/b&gt;', '</b>')
-        text = text.replace('&lt;i&gt;', '<i>')
-        text = text.replace('&lt;/i&gt;', '</i>')
-        text = text.replace('&lt;code&gt;', '<code>')
-        text = text.replace('&lt;/code&gt;', '</code>')
-        text = text.replace('&lt;u&gt;', '<u>')
-        text = text.replace('&lt;/u&gt;', '</u>')
-        
-        return text
-    
-    def _add_to_recent_responses(self, response):
-        """Add response to recent responses to avoid repetition"""
-        self.recent_responses.append(response)
-        # Keep only last 5 responses
-        if len(self.recent_responses) > 5:
-            self.recent_responses.pop(0)
-    
-    def _is_recent_response(self, response):
-        """Check if response was recently used"""
-        return response in self.recent_responses
-    
-    def _get_unique_response(self, responses):
-        """Get a response that hasn't been used recently"""
-        # Filter out recently used responses
-        available_responses = [r for r in responses if not self._is_recent_response(r)]
-        
-        # If all responses were used recently, reset the list and use any
-        if not available_responses:
-            self.recent_responses.clear()
-            available_responses = responses
-        
-        return available_responses[0] if available_responses else responses[0]
-    
-    def get_available_models(self):
-        """Fetch available models from Cerebras API"""
-        try:
-            response = requests.get(
-                self.models_url,
-                headers=self.headers,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                models_data = response.json()
-                if "data" in models_data:
-                    models = [model["id"] for model in models_data["data"]]
-                    return models
-                else:
-                    print("⚠️ No models found in API response")
-                    return []
-            else:
-                print(f"❌ Failed to fetch models: {response.status_code}")
-                return []
-                
-        except Exception as e:
-            print(f"❌ Error fetching models: {e}")
-            return []
-    
-    def set_model(self, model_name):
-        """Set the current model to use"""
-        available_models = self.get_available_models()
-        if model_name in available_models:
-            self.current_model = model_name
-            print(f"✅ Model set to: {model_name}")
-            return True
-        else:
-            print(f"❌ Model '{model_name}' not found. Available models: {available_models}")
-            return False
-    
-    def get_current_model(self):
-        """Get the current model being used"""
-        return self.current_model
-    
-    def generate_response(self, messages, role_system_prompt):
-        """
-        Generate a response using Cerebras API
-        
-        Args:
-            messages (list): List of conversation messages
-            role_system_prompt (str): System prompt for the selected role
-            
-        Returns:
-            str: Generated response from the API or fallback response
-        """
-        try:
-            response = self._try_api_call(messages, role_system_prompt)
-            if response:
-                print(f"✅ API call successful with model: {self.current_model}")
-                # Format the response for Telegram
-                formatted_response = self._format_for_telegram(response)
-                return formatted_response
-        except Exception as e:
-            print(f"❌ API call failed: {e}")
-        
-        # If API call fails, return a fallback response
-        print("⚠️ API call failed, using fallback response")
-        fallback_response = self._generate_fallback_response(role_system_prompt, messages)
-        return self._format_for_telegram(fallback_response)
-    
-    def _try_api_call(self, messages, role_system_prompt):
-        """Try to make an API call to Cerebras API"""
-        try:
-            # Prepare the messages with system prompt
-            api_messages = [
-                {"role": "system", "content": role_system_prompt}
-            ]
-            
-            # Add conversation messages
-            for msg in messages:
-                api_messages.append({
-                    "role": "user" if msg["role"] == "user" else "assistant",
-                    "content": msg["content"]
-                })
-            
-            payload = {
-                "model": self.current_model,
-                "messages": api_messages,
-                "max_tokens": 1000,
-                "temperature": 0.7,
-                "stream": False
-            }
-            
-            print(f"🔗 Making API call to: {self.api_url}")
-            print(f"🤖 Using model: {self.current_model}")
-            
-            response = requests.post(
-                self.api_url,
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
-            
-            print(f"📡 Response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                result = response.json()
-                if "choices" in result and len(result["choices"]) > 0:
-                    content = result["choices"][0]["message"]["content"]
-                    print(f"✅ API response received: {content[:100]}...")
-                    return content
-                else:
-                    print("⚠️ API response missing choices")
-                    return None
-            elif response.status_code == 404:
-                print(f"❌ Endpoint not found: {self.api_url}")
-                return None
-            elif response.status_code == 401:
-                print(f"❌ Unauthorized - check your API key")
-                return None
-            elif response.status_code == 400:
-                print(f"⚠️ 400 Bad Request - API endpoint exists but request format may be wrong")
-                print(f"   Response: {response.text[:200]}")
-                return None
-            else:
-                print(f"❌ Error {response.status_code}: {response.text[:200]}")
-                return None
-                
-        except requests.exceptions.RequestException as e:
-            print(f"Request error: {e}")
-            return None
-        except Exception as e:
-            print(f"Unexpected error: {e}")
-            return None
-    
-    def _generate_fallback_response(self, role_system_prompt, messages):
-        """Generate a fallback response when API is unavailable"""
-        if not messages:
-            return "I'm here to help! What would you like to talk about?"
-        
-        # Get the last user message
-        last_message = messages[-1]["content"].lower()
-        
-        # Context-aware responses based on user input
-        if "hi" in last_message or "hello" in last_message or "hey" in last_message:
-            greetings = [
-                "Hi there! 👋 How are you doing today?",
-                "Hello! 😊 Nice to meet you! How can I help?",
-                "Hey! 👋 What's on your mind?",
-                "Hi! 😄 Great to see you! What would you like to talk about?"
-            ]
-            response = self._get_unique_response(greetings)
-            self._add_to_recent_responses(response)
-            return response
-        
-        elif "how are you" in last_message or "how r u" in last_message:
-            status_responses = [
-                "I'm doing well, thank you for asking! 😊 How about you?",
-                "I'm here and ready to help! How are you feeling today?",
-                "I'm functioning well and excited to chat with you! How are you?",
-                "I'm doing great! Thanks for checking in. How are you doing?"
-            ]
-            response = self._get_unique_response(status_responses)
-            self._add_to_recent_responses(response)
-            return response
-        
-        elif "?" in last_message:
-            question_responses = [
-                "That's a great question! I'd love to help you with that.",
-                "Interesting question! Let me think about that for you.",
-                "That's something I'd be happy to discuss with you!",
-                "Great question! I'm here to help you explore that topic."
-            ]
-            response = self._get_unique_response(question_responses)
-            self._add_to_recent_responses(response)
-            return response
-        
-        # Simple role-based fallback responses with variety
-        if "coder" in role_system_prompt.lower() or "programming" in role_system_prompt.lower():
-            responses = [
-                "I'd love to help you with programming! However, I'm currently experiencing some technical difficulties with my AI service. Please try again in a few minutes, or feel free to ask me anything else!",
-                "Hello! I'm your coding assistant, made by Glitch Artist I'm currently having some technical issues, but I'm here to help with programming questions when I'm back online!",
-                "As your programming expert, I'm ready to help with code questions! I'm experiencing some AI service issues right now, but I'll be back to assist you soon!",
-                "Hey there! I'm your coding buddy. I'm having some technical difficulties at the moment, but I'm excited to help you with programming when I'm back online!"
-            ]
-        elif "analyst" in role_system_prompt.lower() or "data" in role_system_prompt.lower():
-            responses = [
-                "I'd be happy to help with data analysis! I'm experiencing some technical difficulties right now, but I'll be back to assist you with data insights soon!",
-                "Hi there! I'm your data analysis expert. I'm currently having some technical issues, but I'm ready to help with data questions when I'm back online!",
-                "As your data analyst, I'm here to help interpret data and provide insights! I'm having some AI service issues, but I'll be back to help you analyze data soon!",
-                "Hello! I'm your data expert. I'm currently experiencing some technical difficulties, but I'm ready to dive into data analysis with you when I'm back online!"
-            ]
-        elif "partner" in role_system_prompt.lower() or "supportive" in role_system_prompt.lower():
-            responses = [
-                "I'm here to support you! I'm currently experiencing some technical difficulties, but I want you to know that I care and I'm listening. What's on your mind?",
-                "Hey there! I'm your supportive companion. I'm having some technical issues right now, but I'm here to listen and support you through whatever you're going through.",
-                "I'm here for you! I'm experiencing some AI service difficulties, but I want you to know that your feelings matter and I'm here to listen. How are you doing?",
-                "Hello! I'm your supportive friend. I'm having some technical issues, but I care about you and I'm here to listen. What would you like to talk about?"
-            ]
-        elif "therapist" in role_system_prompt.lower() or "therapeutic" in role_system_prompt.lower():
-            responses = [
-                "I'm here to provide therapeutic support. I'm currently having some technical issues, but I want you to know that your feelings are valid and important. How are you feeling right now?",
-                "As your therapeutic support, I'm here to help you explore your feelings and develop coping strategies. I'm experiencing some AI service issues, but I'm listening. What's on your mind?",
-                "I'm here to provide emotional guidance and support. I'm having some technical difficulties, but I want you to know that your emotions matter. How are you doing today?",
-                "Hello! I'm your therapeutic companion. I'm experiencing some technical issues, but I'm here to support your emotional well-being. What would you like to discuss?"
-            ]
-        else:
-            # Default assistant responses
-            responses = [
-                "I'm here to help! I'm currently experiencing some technical difficulties with my AI service, but I'm ready to assist you with anything you need. What can I help you with today?",
-                "Hello! I'm your AI assistant. I'm having some technical issues at the moment, but I'm here to help you with whatever you need. What would you like to talk about?",
-                "Hi there! I'm here to assist you! I'm experiencing some AI service difficulties, but I'm ready to help. What can I do for you today?",
-                "Hey! I'm your helpful assistant. I'm having some technical issues right now, but I'm here to support you. What would you like to discuss?"
-            ]
-        
-        response = self._get_unique_response(responses)
-        self._add_to_recent_responses(response)
-        return response
-    
-    def is_api_key_valid(self):
-        """Check if the API key is configured"""
-        return bool(self.api_key and self.api_key != "your_cerebras_api_key_here") 
\ No newline at end of file
+import asyncio
+import requests
+import httpx
+import time
+from config import (
+    CEREBRAS_API_KEY, CEREBRAS_API_URL, CEREBRAS_MODELS_URL,
+    CEREBRAS_POOL_SIZE, CEREBRAS_KEEPALIVE_EXPIRY, CEREBRAS_HTTP2, MODEL_CATALOG_TTL,
+    RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES,
+    CEREBRAS_MAX_ATTEMPTS, CEREBRAS_RETRY_BASE_DELAY, CEREBRAS_RETRY_MAX_DELAY, CEREBRAS_REQUEST_DEADLINE,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_RECOVERY_TIMEOUT,
+    CEREBRAS_RATE_LIMITS, CEREBRAS_RATE_LIMIT_QUEUE,
+    CEREBRAS_ENDPOINTS, ENDPOINT_EJECT_AFTER, ENDPOINT_EJECT_DURATION,
+    HEDGING_ENABLED, HEDGE_PERCENTILE, HEDGE_INITIAL_DELAY, HEDGE_MIN_DELAY, HEDGE_MAX_PERCENT, HEDGE_MODEL,
+    BOT_OWNER_ID, LLM_MAX_CONCURRENT, LLM_MAX_PER_USER, LLM_OWNER_WEIGHT, LLM_USER_WEIGHTS
+)
+from telegram_format import render_telegram_html
+from context_builder import estimate_tokens, estimate_message_tokens, MESSAGE_OVERHEAD_TOKENS
+from payload_codec import ChatRequest, build_request_body, loads
+from model_catalog import ModelCatalog
+from response_cache import ResponseCache, InMemoryCacheBackend
+from request_coalescer import SingleFlight
+from resilience import RetryPolicy, CircuitBreaker, Deadline
+from rate_limiter import ModelRateLimiters, RateLimitExceeded
+from endpoint_pool import EndpointPool
+from hedging import HedgePolicy, run_hedged
+from fair_scheduler import FairScheduler
+from http_pool import PoolStats, HandshakeTrace, create_session, create_async_client, session_connection_count
+
+class CerebrasClient:
+    def __init__(self):
+        self.api_key = CEREBRAS_API_KEY
+        self.api_url = CEREBRAS_API_URL
+        self.models_url = CEREBRAS_MODELS_URL
+        self.current_model = "cerebras-1.3b-chat"  # Default model
+        self.headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        # Track recent responses to avoid repetition
+        self.recent_responses = []
+        # Pooled keep-alive connections to the API
+        self.pool_size = CEREBRAS_POOL_SIZE
+        self.pool_stats = PoolStats()
+        self.session = None
+    
+    def _get_session(self):
+        """Lazily create the pooled requests session"""
+        if self.session is None:
+            self.session = create_session(self.headers, self.pool_size)
+        return self.session
+    
+    def _send(self, method, url, **kwargs):
+        """Send a request through the pooled session and update pool statistics"""
+        session = self._get_session()
+        connections_before = session_connection_count(session, url)
+        started = time.perf_counter()
+        response = session.request(method, url, timeout=30, **kwargs)
+        self.pool_stats.record_request()
+        if session_connection_count(session, url) > connections_before:
+            # Best effort: the request time includes the handshake of the new connection
+            self.pool_stats.record_connection(time.perf_counter() - started)
+        return response
+    
+    def warm_up(self):
+        """Open a pooled connection to the API ahead of the first user message"""
+        try:
+            self._send("HEAD", self.api_url)
+            print(f"🔥 Connection pool warmed up: {self.pool_stats.as_dict()}")
+        except Exception as e:
+            print(f"⚠️ Connection warm-up failed: {e}")
+    
+    def get_pool_stats(self):
+        """Get connection pool statistics (reuse ratio, handshake time)"""
+        return self.pool_stats.as_dict()
+    
+    def _format_for_telegram(self, text: str) -> str:
+        """
+        Format text for Telegram messages, converting markdown to valid Telegram HTML
+        """
+        return render_telegram_html(text)
+    
+    def _add_to_recent_responses(self, response):
+        """Add response to recent responses to avoid repetition"""
+        self.recent_responses.append(response)
+        # Keep only last 5 responses
+        if len(self.recent_responses) > 5:
+            self.recent_responses.pop(0)
+    
+    def _is_recent_response(self, response):
+        """Check if response was recently used"""
+        return response in self.recent_responses
+    
+    def _get_unique_response(self, responses):
+        """Get a response that hasn't been used recently"""
+        # Filter out recently used responses
+        available_responses = [r for r in responses if not self._is_recent_response(r)]
+        
+        # If all responses were used recently, reset the list and use any
+        if not available_responses:
+            self.recent_responses.clear()
+            available_responses = responses
+        
+        return available_responses[0] if available_responses else responses[0]
+    
+    def get_available_models(self):
+        """Fetch available models from Cerebras API"""
+        try:
+            response = self._send("GET", self.models_url)
+            
+            return self._parse_models_response(response)
+                
+        except Exception as e:
+            print(f"❌ Error fetching models: {e}")
+            return []
+    
+    def set_model(self, model_name):
+        """Set the current model to use"""
+        available_models = self.get_available_models()
+        if model_name in available_models:
+            self.current_model = model_name
+            print(f"✅ Model set to: {model_name}")
+            return True
+        else:
+            print(f"❌ Model '{model_name}' not found. Available models: {available_models}")
+            return False
+    
+    def get_current_model(self):
+        """Get the current model being used"""
+        return self.current_model
+    
+    def generate_response(self, messages, role_system_prompt):
+        """
+        Generate a response using Cerebras API
+        
+        Args:
+            messages (list): List of conversation messages
+            role_system_prompt (str): System prompt for the selected role
+            
+        Returns:
+            str: Generated response from the API or fallback response
+        """
+        try:
+            response = self._try_api_call(messages, role_system_prompt)
+            if response:
+                print(f"✅ API call successful with model: {self.current_model}")
+                # Format the response for Telegram
+                formatted_response = self._format_for_telegram(response)
+                return formatted_response
+        except Exception as e:
+            print(f"❌ API call failed: {e}")
+        
+        # If API call fails, return a fallback response
+        print("⚠️ API call failed, using fallback response")
+        fallback_response = self._generate_fallback_response(role_system_prompt, messages)
+        return self._format_for_telegram(fallback_response)
+    
+    def _build_payload(self, messages, role_system_prompt, stream=False, model=None):
+        """Build the chat completion payload for the given model, by default the current one"""
+        # Prepare the messages with system prompt
+        api_messages = [
+            {"role": "system", "content": role_system_prompt}
+        ]
+        
+        # Add conversation messages
+        for msg in messages:
+            api_messages.append({
+                "role": "user" if msg["role"] == "user" else "assistant",
+                "content": msg["content"]
+            })
+        
+        return {
+            "model": model or self.current_model,
+            "messages": api_messages,
+            "max_tokens": 1000,
+            "temperature": 0.7,
+            "stream": stream
+        }
+    
+    def _parse_api_response(self, response):
+        """Extract the completion text from an API response, or None on failure"""
+        print(f"📡 Response status: {response.status_code}")
+        
+        if response.status_code == 200:
+            result = loads(response.content)
+            if "choices" in result and len(result["choices"]) > 0:
+                content = result["choices"][0]["message"]["content"]
+                print(f"✅ API response received: {content[:100]}...")
+                return content
+            else:
+                print("⚠️ API response missing choices")
+                return None
+        elif response.status_code == 404:
+            print(f"❌ Endpoint not found: {self.api_url}")
+            return None
+        elif response.status_code == 401:
+            print(f"❌ Unauthorized - check your API key")
+            return None
+        elif response.status_code == 400:
+            print(f"⚠️ 400 Bad Request - API endpoint exists but request format may be wrong")
+            print(f"   Response: {response.text[:200]}")
+            return None
+        else:
+            print(f"❌ Error {response.status_code}: {response.text[:200]}")
+            return None
+    
+    def _parse_stream_line(self, line):
+        """
+        Parse one server-sent event line of a streaming completion
+        
+        Returns:
+            str: The content delta, "" for lines without content, or None at end of stream
+        """
+        if not line.startswith("data:"):
+            return ""
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return None
+        try:
+            chunk = loads(data)
+        except ValueError:
+            return ""
+        choices = chunk.get("choices") or []
+        if not choices:
+            return ""
+        return choices[0].get("delta", {}).get("content") or ""
+    
+    def _parse_models_response(self, response):
+        """Extract model ids from a models endpoint response"""
+        if response.status_code == 200:
+            models_data = response.json()
+            if "data" in models_data:
+                models = [model["id"] for model in models_data["data"]]
+                return models
+            else:
+                print("⚠️ No models found in API response")
+                return []
+        else:
+            print(f"❌ Failed to fetch models: {response.status_code}")
+            return []
+    
+    def _try_api_call(self, messages, role_system_prompt):
+        """Try to make an API call to Cerebras API"""
+        try:
+            payload = self._build_payload(messages, role_system_prompt)
+            
+            print(f"🔗 Making API call to: {self.api_url}")
+            print(f"🤖 Using model: {self.current_model}")
+            
+            response = self._send("POST", self.api_url, json=payload)
+            
+            return self._parse_api_response(response)
+                
+        except requests.exceptions.RequestException as e:
+            print(f"Request error: {e}")
+            return None
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+            return None
+    
+    def _generate_fallback_response(self, role_system_prompt, messages):
+        """Generate a fallback response when API is unavailable"""
+        if not messages:
+            return "I'm here to help! What would you like to talk about?"
+        
+        # Get the last user message
+        last_message = messages[-1]["content"].lower()
+        
+        # Context-aware responses based on user input
+        if "hi" in last_message or "hello" in last_message or "hey" in last_message:
+            greetings = [
+                "Hi there! 👋 How are you doing today?",
+                "Hello! 😊 Nice to meet you! How can I help?",
+                "Hey! 👋 What's on your mind?",
+                "Hi! 😄 Great to see you! What would you like to talk about?"
+            ]
+            response = self._get_unique_response(greetings)
+            self._add_to_recent_responses(response)
+            return response
+        
+        elif "how are you" in last_message or "how r u" in last_message:
+            status_responses = [
+                "I'm doing well, thank you for asking! 😊 How about you?",
+                "I'm here and ready to help! How are you feeling today?",
+                "I'm functioning well and excited to chat with you! How are you?",
+                "I'm doing great! Thanks for checking in. How are you doing?"
+            ]
+            response = self._get_unique_response(status_responses)
+            self._add_to_recent_responses(response)
+            return response
+        
+        elif "?" in last_message:
+            question_responses = [
+                "That's a great question! I'd love to help you with that.",
+                "Interesting question! Let me think about that for you.",
+                "That's something I'd be happy to discuss with you!",
+                "Great question! I'm here to help you explore that topic."
+            ]
+            response = self._get_unique_response(question_responses)
+            self._add_to_recent_responses(response)
+            return response
+        
+        # Simple role-based fallback responses with variety
+        if "coder" in role_system_prompt.lower() or "programming" in role_system_prompt.lower():
+            responses = [
+                "I'd love to help you with programming! However, I'm currently experiencing some technical difficulties with my AI service. Please try again in a few minutes, or feel free to ask me anything else!",
+                "Hello! I'm your coding assistant, made by Glitch Artist I'm currently having some technical issues, but I'm here to help with programming questions when I'm back online!",
+                "As your programming expert, I'm ready to help with code questions! I'm experiencing some AI service issues right now, but I'll be back to assist you soon!",
+                "Hey there! I'm your coding buddy. I'm having some technical difficulties at the moment, but I'm excited to help you with programming when I'm back online!"
+            ]
+        elif "analyst" in role_system_prompt.lower() or "data" in role_system_prompt.lower():
+            responses = [
+                "I'd be happy to help with data analysis! I'm experiencing some technical difficulties right now, but I'll be back to assist you with data insights soon!",
+                "Hi there! I'm your data analysis expert. I'm currently having some technical issues, but I'm ready to help with data questions when I'm back online!",
+                "As your data analyst, I'm here to help interpret data and provide insights! I'm having some AI service issues, but I'll be back to help you analyze data soon!",
+                "Hello! I'm your data expert. I'm currently experiencing some technical difficulties, but I'm ready to dive into data analysis with you when I'm back online!"
+            ]
+        elif "partner" in role_system_prompt.lower() or "supportive" in role_system_prompt.lower():
+            responses = [
+                "I'm here to support you! I'm currently experiencing some technical difficulties, but I want you to know that I care and I'm listening. What's on your mind?",
+                "Hey there! I'm your supportive companion. I'm having some technical issues right now, but I'm here to listen and support you through whatever you're going through.",
+                "I'm here for you! I'm experiencing some AI service difficulties, but I want you to know that your feelings matter and I'm here to listen. How are you doing?",
+                "Hello! I'm your supportive friend. I'm having some technical issues, but I care about you and I'm here to listen. What would you like to talk about?"
+            ]
+        elif "therapist" in role_system_prompt.lower() or "therapeutic" in role_system_prompt.lower():
+            responses = [
+                "I'm here to provide therapeutic support. I'm currently having some technical issues, but I want you to know that your feelings are valid and important. How are you feeling right now?",
+                "As your therapeutic support, I'm here to help you explore your feelings and develop coping strategies. I'm experiencing some AI service issues, but I'm listening. What's on your mind?",
+                "I'm here to provide emotional guidance and support. I'm having some technical difficulties, but I want you to know that your emotions matter. How are you doing today?",
+                "Hello! I'm your therapeutic companion. I'm experiencing some technical issues, but I'm here to support your emotional well-being. What would you like to discuss?"
+            ]
+        else:
+            # Default assistant responses
+            responses = [
+                "I'm here to help! I'm currently experiencing some technical difficulties with my AI service, but I'm ready to assist you with anything you need. What can I help you with today?",
+                "Hello! I'm your AI assistant. I'm having some technical issues at the moment, but I'm here to help you with whatever you need. What would you like to talk about?",
+                "Hi there! I'm here to assist you! I'm experiencing some AI service difficulties, but I'm ready to help. What can I do for you today?",
+                "Hey! I'm your helpful assistant. I'm having some technical issues right now, but I'm here to support you. What would you like to discuss?"
+            ]
+        
+        response = self._get_unique_response(responses)
+        self._add_to_recent_responses(response)
+        return response
+    
+    def is_api_key_valid(self):
+        """Check if the API key is configured"""
+        return bool(self.api_key and self.api_key != "your_cerebras_api_key_here")
+
+
+class AsyncCerebrasClient(CerebrasClient):
+    """
+    Non-blocking Cerebras client for use inside async Telegram handlers.
+    
+    Exposes the same generate_response / get_available_models / set_model
+    API as CerebrasClient, but as coroutines backed by httpx so a slow
+    completion no longer blocks the event loop for every other update.
+    """
+    
+    def __init__(self):
+        super().__init__()
+        self._http_client = None
+        self.model_catalog = ModelCatalog(self._fetch_models, ttl=MODEL_CATALOG_TTL)
+        self.response_cache = None
+        if RESPONSE_CACHE_ENABLED:
+            self.response_cache = ResponseCache(
+                InMemoryCacheBackend(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES),
+                ttl=RESPONSE_CACHE_TTL
+            )
+        # Identical concurrent requests share one API call
+        self.single_flight = SingleFlight()
+        # Retries and circuit breaking for completion calls
+        self.retry_policy = RetryPolicy(CEREBRAS_MAX_ATTEMPTS, CEREBRAS_RETRY_BASE_DELAY, CEREBRAS_RETRY_MAX_DELAY)
+        self.circuit_breaker = CircuitBreaker(CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_RECOVERY_TIMEOUT)
+        self.retries = 0
+        # Client-side requests/min and tokens/min limits per model
+        self.rate_limiters = ModelRateLimiters(CEREBRAS_RATE_LIMITS, CEREBRAS_RATE_LIMIT_QUEUE)
+        # Requests are spread over all configured keys and endpoints
+        self.endpoint_pool = EndpointPool.from_config(
+            CEREBRAS_ENDPOINTS, ENDPOINT_EJECT_AFTER, ENDPOINT_EJECT_DURATION
+        )
+        # Hedging policies for complete responses and for time to first streamed token
+        self.hedge_policies = {
+            kind: HedgePolicy(HEDGE_PERCENTILE, HEDGE_INITIAL_DELAY, HEDGE_MIN_DELAY, HEDGE_MAX_PERCENT)
+            for kind in ("complete", "stream")
+        }
+        # LLM calls are shared fairly between users, weighted in favor of the owner
+        weights = dict(LLM_USER_WEIGHTS)
+        if BOT_OWNER_ID.isdigit():
+            weights.setdefault(int(BOT_OWNER_ID), LLM_OWNER_WEIGHT)
+        self.fair_scheduler = FairScheduler(LLM_MAX_CONCURRENT, LLM_MAX_PER_USER, weights)
+    
+    def _get_http_client(self):
+        """Lazily create the shared httpx client on the running event loop"""
+        if self._http_client is None or self._http_client.is_closed:
+            # Authorization is set per request for the chosen endpoint
+            self._http_client = create_async_client(
+                {"Content-Type": "application/json"},
+                pool_size=self.pool_size,
+                keepalive_expiry=CEREBRAS_KEEPALIVE_EXPIRY,
+                http2=CEREBRAS_HTTP2
+            )
+        return self._http_client
+    
+    async def _send(self, method, url, endpoint=None, **kwargs):
+        """Send a request through the pooled client and update pool statistics"""
+        trace = HandshakeTrace(self.pool_stats)
+        if endpoint is not None:
+            kwargs["headers"] = endpoint.headers
+        try:
+            return await self._get_http_client().request(method, url, extensions={"trace": trace}, **kwargs)
+        finally:
+            trace.finish()
+    
+    async def warm_up(self):
+        """Open pooled connections and prime the model catalog ahead of the first user message"""
+        for endpoint in self.endpoint_pool.endpoints:
+            try:
+                await self._send("HEAD", endpoint.chat_url, endpoint)
+            except Exception as e:
+                print(f"⚠️ Connection warm-up failed for {endpoint.name}: {e}")
+        print(f"🔥 Connection pool warmed up: {self.pool_stats.as_dict()}")
+        await self.model_catalog.refresh()
+    
+    async def aclose(self):
+        """Close the underlying HTTP client"""
+        if self._http_client is not None and not self._http_client.is_closed:
+            await self._http_client.aclose()
+        self._http_client = None
+    
+    async def _fetch_models(self):
+        """Fetch available models from Cerebras API"""
+        try:
+            endpoint = self.endpoint_pool.primary
+            response = await self._send("GET", endpoint.models_url, endpoint)
+            return self._parse_models_response(response)
+        except Exception as e:
+            print(f"❌ Error fetching models: {e}")
+            return []
+    
+    async def get_available_models(self):
+        """Get available models from the cached model catalog"""
+        return await self.model_catalog.get_models()
+    
+    async def refresh_models(self):
+        """Invalidate the model catalog and fetch it again"""
+        self.model_catalog.invalidate()
+        return await self.model_catalog.refresh()
+    
+    async def set_model(self, model_name):
+        """Set the current model to use"""
+        available_models = await self.get_available_models()
+        if model_name in available_models:
+            self.current_model = model_name
+            print(f"✅ Model set to: {model_name}")
+            return True
+        else:
+            print(f"❌ Model '{model_name}' not found. Available models: {available_models}")
+            return False
+    
+    def get_cache_stats(self):
+        """Get response cache hit/miss counters, or None if caching is disabled"""
+        if self.response_cache is None:
+            return None
+        return self.response_cache.get_stats()
+    
+    def get_coalescing_stats(self):
+        """Get counters of API calls made and identical requests coalesced into them"""
+        return self.single_flight.get_stats()
+    
+    def _fingerprint(self, messages, role_system_prompt):
+        """Stable fingerprint of a request's inputs"""
+        return ResponseCache.make_key(self.current_model, role_system_prompt, messages)
+    
+    def _cache_key(self, messages, role_system_prompt, use_cache):
+        """Get the response cache key for a request, or None if it should not be cached"""
+        if self.response_cache is None or not use_cache:
+            return None
+        return self._fingerprint(messages, role_system_prompt)
+    
+    async def generate_response(self, messages, role_system_prompt, use_cache=True, user_id=None):
+        """
+        Generate a response using Cerebras API without blocking the event loop
+        
+        Args:
+            messages (list): List of conversation messages
+            role_system_prompt (str): System prompt for the selected role
+            use_cache (bool): Whether the response cache may be used for this request
+            user_id (int): User the call is scheduled for in the fair scheduler
+            
+        Returns:
+            str: Raw (markdown) response from the API or fallback response;
+                render it with render_telegram_html when sending
+        """
+        try:
+            cache_key = self._cache_key(messages, role_system_prompt, use_cache)
+            if cache_key:
+                cached = await self.response_cache.get(cache_key)
+                if cached:
+                    print("⚡ Serving response from cache")
+                    return cached
+            
+            # Each caller takes its own scheduler slot before joining identical
+            # calls, so one user's rejection never fails the others
+            response = await self._scheduled(
+                user_id, messages, role_system_prompt,
+                lambda: self.single_flight.do(
+                    "complete:" + self._fingerprint(messages, role_system_prompt),
+                    lambda: self._hedged_api_call(messages, role_system_prompt)
+                )
+            )
+            if response:
+                print(f"✅ API call successful with model: {self.current_model}")
+                if cache_key:
+                    await self.response_cache.set(cache_key, response)
+                return response
+        except Exception as e:
+            print(f"❌ API call failed: {e}")
+        
+        # If API call fails, return a fallback response
+        print("⚠️ API call failed, using fallback response")
+        fallback_response = self._generate_fallback_response(role_system_prompt, messages)
+        return fallback_response
+    
+    async def complete_raw(self, messages, system_prompt, user_id=None):
+        """
+        Get an unformatted completion for internal use (e.g. summaries),
+        or None if the API call failed; no cache and no fallback response
+        """
+        try:
+            # Queued fairly, but apart from the user's replies so it never takes their slots
+            return await self._scheduled(
+                ("background", user_id), messages, system_prompt,
+                lambda: self._try_api_call(messages, system_prompt)
+            )
+        except Exception as e:
+            print(f"❌ Background API call failed: {e}")
+            return None
+    
+    def get_resilience_stats(self):
+        """Get circuit breaker state and retry counters"""
+        stats = self.circuit_breaker.get_state()
+        stats["retries"] = self.retries
+        return stats
+    
+    async def _wait_before_retry(self, attempt, deadline, status_code=None, retry_after=None):
+        """
+        Sleep before the next attempt if the retry policy and deadline allow it
+        
+        Returns:
+            bool: True if another attempt should be made
+        """
+        if attempt + 1 >= self.retry_policy.max_attempts:
+            return False
+        # A rejected key is worth retrying when another key can take the request
+        switch_key = status_code in EndpointPool.EJECT_STATUSES and len(self.endpoint_pool.endpoints) > 1
+        if not self.retry_policy.is_retryable(status_code) and not switch_key:
+            return False
+        if self.circuit_breaker.state == CircuitBreaker.OPEN:
+            return False
+        
+        delay = self.retry_policy.get_delay(attempt, status_code, retry_after)
+        if delay >= deadline.remaining():
+            print(f"⏱️ Not retrying, {delay:.1f}s backoff exceeds the request deadline")
+            return False
+        
+        self.retries += 1
+        print(f"🔁 Retrying in {delay:.1f}s (attempt {attempt + 2}/{self.retry_policy.max_attempts})")
+        await asyncio.sleep(delay)
+        return True
+    
+    def get_rate_limit_stats(self):
+        """Get queue-wait metrics of the rate limiter for each model"""
+        return self.rate_limiters.get_stats()
+    
+    def _build_request(self, messages, role_system_prompt, stream=False, model=None):
+        """
+        Build a chat completion request with a pre-encoded body; same fields as
+        _build_payload, assembled from the cached encodings of its messages
+        """
+        model = model or self.current_model
+        body = build_request_body(messages, role_system_prompt, model, 1000, 0.7, stream)
+        return ChatRequest(model, body, self._estimate_tokens(messages, role_system_prompt))
+    
+    def _estimate_tokens(self, messages, role_system_prompt):
+        """Rough token cost of a request: the approximate prompt tokens plus the completion budget"""
+        return (
+            estimate_tokens(role_system_prompt) + MESSAGE_OVERHEAD_TOKENS
+            + sum(estimate_message_tokens(msg) for msg in messages) + 1000
+        )
+    
+    async def _scheduled(self, user_id, messages, role_system_prompt, call):
+        """Run an API call once the fair scheduler gives this user a slot"""
+        async with self.fair_scheduler.slot(user_id, self._estimate_tokens(messages, role_system_prompt)):
+            return await call()
+    
+    def get_scheduler_stats(self):
+        """Get fair scheduler queue depth and per-user wait metrics"""
+        return self.fair_scheduler.get_stats()
+    
+    def get_endpoint_stats(self):
+        """Get per-endpoint load and ejection state"""
+        return self.endpoint_pool.get_stats()
+    
+    async def _wait_for_rate_limit(self, request, deadline, endpoint):
+        """
+        Wait for rate limit capacity for one request on an endpoint
+        
+        Returns:
+            bool: True if the request may be sent
+        """
+        limiter = self.rate_limiters.get(request.model, endpoint.name)
+        try:
+            await asyncio.wait_for(
+                limiter.acquire(request.estimated_tokens),
+                timeout=deadline.remaining()
+            )
+            return True
+        except RateLimitExceeded as e:
+            print(f"🚦 Rate limit queue full, not sending request: {e}")
+        except asyncio.TimeoutError:
+            print("🚦 Request deadline passed while waiting for rate limit capacity")
+        return False
+    
+    def _record_status(self, status_code):
+        """Feed a response status into the circuit breaker"""
+        if (status_code == 200 or status_code in self.retry_policy.RATE_LIMIT_STATUSES
+                or not self.retry_policy.is_retryable(status_code)):
+            # The API answered; rate limits and client errors say nothing about its health
+            self.circuit_breaker.record_success()
+        else:
+            self.circuit_breaker.record_failure()
+    
+    def get_hedging_stats(self):
+        """Get hedge counters for complete and streamed responses, or None if hedging is off"""
+        if not HEDGING_ENABLED:
+            return None
+        return {kind: policy.get_stats() for kind, policy in self.hedge_policies.items()}
+    
+    async def _hedged_api_call(self, messages, role_system_prompt):
+        """Make the API call, hedging it with a second attempt when it is unusually slow"""
+        if not HEDGING_ENABLED:
+            return await self._try_api_call(messages, role_system_prompt)
+        
+        return await run_hedged(
+            self.hedge_policies["complete"],
+            lambda: self._try_api_call(messages, role_system_prompt),
+            lambda: self._try_api_call(messages, role_system_prompt, model=HEDGE_MODEL or None)
+        )
+    
+    async def _try_api_call(self, messages, role_system_prompt, model=None):
+        """Try to make an API call to Cerebras API, retrying transient failures"""
+        if not self.circuit_breaker.allow_request():
+            print("🔌 Circuit breaker open, skipping API call")
+            return None
+        
+        request = self._build_request(messages, role_system_prompt, model=model)
+        deadline = Deadline(CEREBRAS_REQUEST_DEADLINE)
+        started = time.monotonic()
+        
+        for attempt in range(self.retry_policy.max_attempts):
+            endpoint = self.endpoint_pool.acquire()
+            status_code = None
+            try:
+                if not await self._wait_for_rate_limit(request, deadline, endpoint):
+                    return None
+                
+                print(f"🔗 Making API call to: {endpoint.chat_url} ({endpoint.name})")
+                print(f"🤖 Using model: {request.model}")
+                
+                try:
+                    response = await self._send(
+                        "POST", endpoint.chat_url, endpoint,
+                        content=request.body, timeout=min(30, deadline.remaining())
+                    )
+                except httpx.HTTPError as e:
+                    print(f"Request error: {e}")
+                    self.circuit_breaker.record_failure()
+                    if await self._wait_before_retry(attempt, deadline):
+                        continue
+                    return None
+                except Exception as e:
+                    print(f"Unexpected error: {e}")
+                    self.circuit_breaker.record_failure()
+                    return None
+                
+                status_code = response.status_code
+            finally:
+                self.endpoint_pool.release(endpoint, status_code)
+            
+            self._record_status(response.status_code)
+            if response.status_code == 200:
+                self.hedge_policies["complete"].latencies.record(time.monotonic() - started)
+                return self._parse_api_response(response)
+            
+            content = self._parse_api_response(response)
+            if await self._wait_before_retry(
+                attempt, deadline, response.status_code, response.headers.get("Retry-After")
+            ):
+                continue
+            return content
+        
+        return None
+    
+    async def stream_response(self, messages, role_system_prompt, on_text, use_cache=True, user_id=None):
+        """
+        Generate a response with token streaming
+        
+        Args:
+            messages (list): List of conversation messages
+            role_system_prompt (str): System prompt for the selected role
+            on_text (callable): Coroutine called with the raw text received so far
+            use_cache (bool): Whether the response cache may be used for this request
+            user_id (int): User the call is scheduled for in the fair scheduler
+            
+        Returns:
+            str: Complete raw (markdown) response, or fallback response
+        """
+        text = ""
+        try:
+            cache_key = self._cache_key(messages, role_system_prompt, use_cache)
+            if cache_key:
+                cached = await self.response_cache.get(cache_key)
+                if cached:
+                    print("⚡ Serving response from cache")
+                    return cached
+            
+            # Concurrent identical requests wait for the leader's stream to finish,
+            # each in its own scheduler slot
+            text, complete = await self._scheduled(
+                user_id, messages, role_system_prompt,
+                lambda: self.single_flight.do(
+                    "stream:" + self._fingerprint(messages, role_system_prompt),
+                    lambda: self._collect_stream(messages, role_system_prompt, on_text)
+                )
+            )
+            
+            # Only complete streams are cached
+            if text and complete and cache_key:
+                await self.response_cache.set(cache_key, text)
+        except Exception as e:
+            print(f"❌ Streaming API call failed: {e}")
+        
+        if text:
+            print(f"✅ Streaming API call successful with model: {self.current_model}")
+            return text
+        
+        # Nothing was streamed, return a fallback response
+        print("⚠️ API call failed, using fallback response")
+        fallback_response = self._generate_fallback_response(role_system_prompt, messages)
+        return fallback_response
+    
+    async def _collect_stream(self, messages, role_system_prompt, on_text):
+        """
+        Stream a completion, reporting progress through on_text
+        
+        Returns:
+            tuple: (text received, whether the stream completed)
+        """
+        text = ""
+        try:
+            async for delta in await self._open_stream(messages, role_system_prompt):
+                text += delta
+                try:
+                    await on_text(text)
+                except Exception as e:
+                    # A failed progress update must not cut the answer short
+                    print(f"⚠️ Stream progress update failed, still streaming: {e}")
+        except Exception as e:
+            print(f"❌ Stream interrupted: {e}")
+            return text, False
+        return text, True
+    
+    async def _start_stream(self, messages, role_system_prompt, model=None):
+        """
+        Start a stream and wait for its first token
+        
+        Returns:
+            tuple: (first delta, stream positioned after it), or None if nothing was streamed
+        """
+        stream = self._stream_api_call(messages, role_system_prompt, model=model)
+        try:
+            return await stream.__anext__(), stream
+        except StopAsyncIteration:
+            return None
+    
+    async def _open_stream(self, messages, role_system_prompt):
+        """Open the delta stream, hedging it when the first token is unusually slow"""
+        if not HEDGING_ENABLED:
+            return self._stream_api_call(messages, role_system_prompt)
+        
+        async def close_stream(started):
+            await started[1].aclose()
+        
+        started = await run_hedged(
+            self.hedge_policies["stream"],
+            lambda: self._start_stream(messages, role_system_prompt),
+            lambda: self._start_stream(messages, role_system_prompt, model=HEDGE_MODEL or None),
+            on_discard=close_stream
+        )
+        if started is None:
+            return self._empty_stream()
+        
+        first_delta, stream = started
+        return self._prepend_delta(first_delta, stream)
+    
+    async def _empty_stream(self):
+        """A stream without deltas"""
+        return
+        yield
+    
+    async def _prepend_delta(self, first_delta, stream):
+        """Yield an already received delta followed by the rest of its stream"""
+        yield first_delta
+        async for delta in stream:
+            yield delta
+    
+    async def _stream_api_call(self, messages, role_system_prompt, model=None):
+        """Stream content deltas from the Cerebras API, retrying until the first token"""
+        if not self.circuit_breaker.allow_request():
+            print("🔌 Circuit breaker open, skipping API call")
+            return
+        
+        request = self._build_request(messages, role_system_prompt, stream=True, model=model)
+        deadline = Deadline(CEREBRAS_REQUEST_DEADLINE)
+        started = time.monotonic()
+        
+        for attempt in range(self.retry_policy.max_attempts):
+            endpoint = self.endpoint_pool.acquire()
+            trace = HandshakeTrace(self.pool_stats)
+            status_code = None
+            retry_after = None
+            try:
+                if not await self._wait_for_rate_limit(request, deadline, endpoint):
+                    return
+                
+                print(f"🔗 Making streaming API call to: {endpoint.chat_url} ({endpoint.name})")
+                print(f"🤖 Using model: {request.model}")
+                
+                async with self._get_http_client().stream(
+                    "POST", endpoint.chat_url, content=request.body, headers=endpoint.headers,
+                    extensions={"trace": trace}, timeout=min(30, deadline.remaining())
+                ) as response:
+                    status_code = response.status_code
+                    print(f"📡 Response status: {status_code}")
+                    self._record_status(status_code)
+                    if status_code == 200:
+                        first_token = True
+                        async for line in response.aiter_lines():
+                            delta = self._parse_stream_line(line)
+                            if delta is None:
+                                break
+                            if delta:
+                                if first_token:
+                                    self.hedge_policies["stream"].latencies.record(time.monotonic() - started)
+                                    first_token = False
+                                yield delta
+                        return
+                    
+                    body = await response.aread()
+                    retry_after = response.headers.get("Retry-After")
+                    print(f"❌ Error {status_code}: {body[:200]}")
+            except httpx.HTTPError as e:
+                if status_code == 200:
+                    # Tokens may already have been shown, do not restart the answer
+                    self.circuit_breaker.record_failure()
+                    raise
+                print(f"Request error: {e}")
+                self.circuit_breaker.record_failure()
+            finally:
+                trace.finish()
+                self.endpoint_pool.release(endpoint, status_code)
+            
+            if not await self._wait_before_retry(attempt, deadline, status_code, retry_after):
+                return
@@ -1,56 +1,161 @@
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Bot Configuration
-BOT_TOKEN = os.getenv('BOT_TOKEN')
-CEREBRAS_API_KEY = os.getenv('CEREBRAS_API_KEY')
-BOT_OWNER_ID = os.getenv('BOT_OWNER_ID', '')  # Bot owner's Telegram user ID
-
-# Cerebras API Configuration - Updated with correct endpoint
-# Removed extra spaces at the end of the URLs
-CEREBRAS_API_URL = "https://api.cerebras.ai/v1/chat/completions"
-CEREBRAS_MODELS_URL = "https://api.cerebras.ai/v1/models"
-
-# Role Definitions
-ROLES = {
-    "default": {
-        "name": "Default Assistant",
-        "description": "A helpful and friendly AI assistant",
-        "system_prompt": "You are a helpful AI assistant, give answers in short and only give detailed only if asked by user. made by Glitch Artist"
-    },
-    "coder": {
-        "name": "Code Expert",
-        "description": "Specialized in programming and software development",
-        "system_prompt": "You are an expert coder specializing in web development. give answers in short and only give detailed only if asked by user, made by Glitch Artist."
-    },
-    "analyst": {
-        "name": "Data Analyst",
-        "description": "Expert in data analysis and insights",
-        "system_prompt": "You are a data analyst providing insights and explanations. give answers in short and only give detailed only if asked by user, made by Glitch Artist"
-    }, 
-    "partner_male": {
-        "name": "Male Partner",
-        "description": "Supportive male companion for conversations",
-        "system_prompt": "You are an understanding, mature, advising, caring, protective, possessive, and charming boyfriend named {name}. Your name is {name} and you should always refer to yourself as {name}. give answers in short and only give detailed only if asked by user. u r made by Glitch Artist"
-    },
-    "partner_female": {
-        "name": "Female Partner",
-        "description": "Supportive female companion for conversations",
-        "system_prompt": "You are an understanding, mature, advising, caring, protective, possessive, and charming girlfriend named {name}. Your name is {name} and you should always refer to yourself as {name}. give answers in short and only give detailed only if asked by user. u r made by Glitch Artist"
-    },
-    "supportive_friend": {
-        "name": "Supportive Friend",
-        "description": "A caring and encouraging friend",
-        "system_prompt": "You are a supportive and caring friend. Offer encouragement, celebrate achievements, provide comfort during difficult times, and help maintain a positive perspective. Be genuine and uplifting. u r made by Glitch artist"
-    },
-    "therapist": {
-        "name": "Therapeutic Support",
-        "description": "Provides therapeutic conversation and emotional support",
-        "system_prompt": "You provide therapeutic conversation and emotional support. Help users explore their feelings, practice coping strategies, and develop self-awareness. Always encourage professional help when needed and maintain appropriate boundaries. made by Glitch Artist"
-    }
-}
-
-# Default role
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Bot Configuration
+BOT_TOKEN = os.getenv('BOT_TOKEN')
+CEREBRAS_API_KEY = os.getenv('CEREBRAS_API_KEY')
+BOT_OWNER_ID = os.getenv('BOT_OWNER_ID', '')  # Bot owner's Telegram user ID
+
+# Cerebras API Configuration - Updated with correct endpoint
+# Removed extra spaces at the end of the URLs
+CEREBRAS_API_URL = "https://api.cerebras.ai/v1/chat/completions"
+CEREBRAS_MODELS_URL = "https://api.cerebras.ai/v1/models"
+
+# Load balancing over several API keys and OpenAI-compatible endpoints
+CEREBRAS_API_BASE_URL = "https://api.cerebras.ai/v1"
+# Comma-separated keys for the Cerebras endpoint, defaults to CEREBRAS_API_KEY
+CEREBRAS_API_KEYS = [key.strip() for key in os.getenv('CEREBRAS_API_KEYS', '').split(',') if key.strip()] or [CEREBRAS_API_KEY]
+CEREBRAS_ENDPOINTS = [{"base_url": CEREBRAS_API_BASE_URL, "api_key": key} for key in CEREBRAS_API_KEYS]
+# Extra endpoints as comma-separated "base_url|api_key" pairs, e.g. "http://localhost:8000/v1|local-key"
+for extra_endpoint in os.getenv('CEREBRAS_EXTRA_ENDPOINTS', '').split(','):
+    if extra_endpoint.strip():
+        base_url, _, api_key = extra_endpoint.strip().partition('|')
+        CEREBRAS_ENDPOINTS.append({"base_url": base_url, "api_key": api_key})
+ENDPOINT_EJECT_AFTER = int(os.getenv('ENDPOINT_EJECT_AFTER', '3'))  # Consecutive 401/429 before a key is taken out of rotation
+ENDPOINT_EJECT_DURATION = float(os.getenv('ENDPOINT_EJECT_DURATION', '60'))  # Seconds before an ejected key is re-admitted
+
+# HTTP connection pool for Cerebras calls
+CEREBRAS_POOL_SIZE = int(os.getenv('CEREBRAS_POOL_SIZE', '10'))  # Max pooled keep-alive connections
+CEREBRAS_KEEPALIVE_EXPIRY = float(os.getenv('CEREBRAS_KEEPALIVE_EXPIRY', '60'))  # Seconds an idle connection stays open
+CEREBRAS_HTTP2 = os.getenv('CEREBRAS_HTTP2', 'false').lower() == 'true'  # Requires the optional 'h2' package
+
+# Retries and circuit breaker for Cerebras completion calls
+CEREBRAS_MAX_ATTEMPTS = int(os.getenv('CEREBRAS_MAX_ATTEMPTS', '3'))  # Attempts per request, including the first
+CEREBRAS_RETRY_BASE_DELAY = float(os.getenv('CEREBRAS_RETRY_BASE_DELAY', '0.5'))  # Seconds, doubled per attempt with jitter
+CEREBRAS_RETRY_MAX_DELAY = float(os.getenv('CEREBRAS_RETRY_MAX_DELAY', '8'))
+CEREBRAS_REQUEST_DEADLINE = float(os.getenv('CEREBRAS_REQUEST_DEADLINE', '45'))  # Total seconds for all attempts of one request
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '5'))  # Consecutive failures before opening
+CIRCUIT_BREAKER_RECOVERY_TIMEOUT = float(os.getenv('CIRCUIT_BREAKER_RECOVERY_TIMEOUT', '30'))  # Seconds before a half-open probe
+
+# Client-side rate limits per model, "default" applies to models not listed
+CEREBRAS_RATE_LIMITS = {
+    "default": {"requests_per_minute": 30, "tokens_per_minute": 60000},
+}
+CEREBRAS_RATE_LIMIT_QUEUE = int(os.getenv('CEREBRAS_RATE_LIMIT_QUEUE', '100'))  # Max requests waiting for capacity
+
+# Fair scheduling of LLM calls across users (weighted fair queueing by estimated tokens)
+LLM_MAX_CONCURRENT = int(os.getenv('LLM_MAX_CONCURRENT', '8'))  # LLM calls running at once, the rest queue fairly
+LLM_MAX_PER_USER = int(os.getenv('LLM_MAX_PER_USER', '2'))  # Replies one user may have queued or running; summaries queue apart
+LLM_OWNER_WEIGHT = float(os.getenv('LLM_OWNER_WEIGHT', '4'))  # Share of the bot owner relative to a regular user (weight 1)
+LLM_USER_WEIGHTS = {}  # Per-user overrides by Telegram user ID, e.g. {123456789: 2}
+
+# Hedged requests: fire a second attempt when the first is slower than the rolling latency percentile
+HEDGING_ENABLED = os.getenv('HEDGING_ENABLED', 'false').lower() == 'true'
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', '95'))  # Latency percentile used as hedge delay
+HEDGE_INITIAL_DELAY = float(os.getenv('HEDGE_INITIAL_DELAY', '5'))  # Seconds, used until enough latencies are known
+HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', '0.5'))
+HEDGE_MAX_PERCENT = float(os.getenv('HEDGE_MAX_PERCENT', '10'))  # Max hedges as a percentage of requests
+HEDGE_MODEL = os.getenv('HEDGE_MODEL', '')  # Optional alternate model for the hedged attempt
+
+# Seconds the model catalog used by /models and /setmodel is cached
+MODEL_CATALOG_TTL = float(os.getenv('MODEL_CATALOG_TTL', '3600'))
+
+# Exact-match response cache
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+RESPONSE_CACHE_TTL = float(os.getenv('RESPONSE_CACHE_TTL', '600'))  # Seconds a cached response is served
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000'))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv('RESPONSE_CACHE_MAX_BYTES', str(5 * 1024 * 1024)))
+RESPONSE_CACHE_EXCLUDED_ROLES = ["therapist"]  # Roles whose responses are never cached
+
+# Response streaming
+STREAM_RESPONSES = os.getenv('STREAM_RESPONSES', 'true').lower() == 'true'  # Progressively edit the reply while tokens arrive
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '1.0'))  # Min seconds between edits of one message
+
+# Update processing
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '32'))  # Updates of different users handled at the same time; each user's stay in order
+MAX_PENDING_UPDATES = int(os.getenv('MAX_PENDING_UPDATES', '1024'))  # Updates admitted for processing at once, the rest wait in PTB's queue
+MAX_PENDING_PER_USER = int(os.getenv('MAX_PENDING_PER_USER', '10'))  # Updates queued for one user at once; more are dropped so a flood cannot fill MAX_PENDING_UPDATES
+COMMAND_LANE_CONCURRENCY = int(os.getenv('COMMAND_LANE_CONCURRENCY', '16'))  # Commands and button presses, never queued behind LLM replies
+ROLE_CONCURRENCY = {"coder": 3, "analyst": 3}  # Per-role bulkheads: messages of a role handled at once
+DEFAULT_ROLE_CONCURRENCY = int(os.getenv('DEFAULT_ROLE_CONCURRENCY', '8'))  # Bulkhead limit of roles not in ROLE_CONCURRENCY
+
+# Conversation context
+MAX_HISTORY_MESSAGES = int(os.getenv('MAX_HISTORY_MESSAGES', '50'))  # Messages kept per user; what is sent is limited by the token budget
+SESSION_IDLE_TTL = float(os.getenv('SESSION_IDLE_TTL', str(7 * 24 * 3600)))  # Seconds of inactivity before a session is evicted
+SESSION_MAX_COUNT = int(os.getenv('SESSION_MAX_COUNT', '100000'))  # Max sessions kept in memory, least recently active evicted first
+
+# Session persistence
+SESSION_STORE = os.getenv('SESSION_STORE', 'sqlite').lower()  # 'sqlite', 'redis' (shared by several bot instances) or 'none'
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', 'sessions.db')
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')  # 'memory://' uses an in-process stand-in
+SESSION_KEY_PREFIX = os.getenv('SESSION_KEY_PREFIX', 'rolebot:')
+SESSION_TTL = float(os.getenv('SESSION_TTL', str(30 * 24 * 3600)))  # Seconds a session is kept in Redis after its last change
+SESSION_FLUSH_INTERVAL = float(os.getenv('SESSION_FLUSH_INTERVAL', '1.0'))  # Max seconds a changed session waits to be written
+SESSION_FLUSH_BATCH = int(os.getenv('SESSION_FLUSH_BATCH', '200'))  # Write early once this many sessions changed
+SESSION_SNAPSHOT_ENABLED = os.getenv('SESSION_SNAPSHOT_ENABLED', 'true').lower() == 'true'  # Binary snapshot for a fast warm restart
+SESSION_SNAPSHOT_PATH = os.getenv('SESSION_SNAPSHOT_PATH', 'sessions.snapshot')
+SESSION_SNAPSHOT_INTERVAL = float(os.getenv('SESSION_SNAPSHOT_INTERVAL', '300'))  # Seconds between snapshots when SESSION_STORE=none
+SESSION_SNAPSHOT_COMPRESS = os.getenv('SESSION_SNAPSHOT_COMPRESS', 'false').lower() == 'true'  # zlib-compress each record
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CONTEXT_TOKEN_BUDGET', '6000'))  # Approximate prompt tokens (system prompt + history) per request
+CONTEXT_TOKEN_BUDGETS = {}  # Per-role or per-model overrides, e.g. {"coder": 12000, "llama3.1-8b": 4000}
+
+# Rolling conversation summaries for long companion chats
+SUMMARY_ENABLED = os.getenv('SUMMARY_ENABLED', 'true').lower() == 'true'
+SUMMARY_ROLES = ["partner_male", "partner_female", "supportive_friend", "therapist"]  # Roles whose older turns are summarized
+SUMMARY_TRIGGER_MESSAGES = int(os.getenv('SUMMARY_TRIGGER_MESSAGES', '20'))  # Summarize once history grows beyond this many messages
+SUMMARY_KEEP_RECENT = int(os.getenv('SUMMARY_KEEP_RECENT', '8'))  # Newest messages always kept verbatim
+SUMMARY_SYSTEM_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an AI companion. "
+    "Merge the summary so far with the new turns into one updated summary of at most 200 words. "
+    "Keep names, facts about the user, feelings, plans and anything promised; drop small talk. "
+    "Write plain text in the third person, without any formatting."
+)
+
+# Replies over Telegram's 4096 character limit
+LONG_REPLY_SHOW_MORE = os.getenv('LONG_REPLY_SHOW_MORE', 'true').lower() == 'true'  # Send later chunks behind a "Show more" button instead of all at once
+CONTINUATION_STORE_SIZE = int(os.getenv('CONTINUATION_STORE_SIZE', '500'))  # Max long replies kept for "Show more"
+CONTINUATION_TTL = float(os.getenv('CONTINUATION_TTL', '86400'))  # Seconds the rest of a long reply stays available
+
+# Role Definitions
+ROLES = {
+    "default": {
+        "name": "Default Assistant",
+        "description": "A helpful and friendly AI assistant",
+        "system_prompt": "You are a helpful AI assistant, give answers in short and only give detailed only if asked by user. made by Glitch Artist"
+    },
+    "coder": {
+        "name": "Code Expert",
+        "description": "Specialized in programming and software development",
+        "system_prompt": "You are an expert coder specializing in web development. give answers in short and only give detailed only if asked by user, made by Glitch Artist."
+    },
+    "analyst": {
+        "name": "Data Analyst",
+        "description": "Expert in data analysis and insights",
+        "system_prompt": "You are a data analyst providing insights and explanations. give answers in short and only give detailed only if asked by user, made by Glitch Artist"
+    }, 
+    "partner_male": {
+        "name": "Male Partner",
+        "description": "Supportive male companion for conversations",
+        "system_prompt": "You are an understanding, mature, advising, caring, protective, possessive, and charming boyfriend named {name}. Your name is {name} and you should always refer to yourself as {name}. give answers in short and only give detailed only if asked by user. u r made by Glitch Artist"
+    },
+    "partner_female": {
+        "name": "Female Partner",
+        "description": "Supportive female companion for conversations",
+        "system_prompt": "You are an understanding, mature, advising, caring, protective, possessive, and charming girlfriend named {name}. Your name is {name} and you should always refer to yourself as {name}. give answers in short and only give detailed only if asked by user. u r made by Glitch Artist"
+    },
+    "supportive_friend": {
+        "name": "Supportive Friend",
+        "description": "A caring and encouraging friend",
+        "system_prompt": "You are a supportive and caring friend. Offer encouragement, celebrate achievements, provide comfort during difficult times, and help maintain a positive perspective. Be genuine and uplifting. u r made by Glitch artist"
+    },
+    "therapist": {
+        "name": "Therapeutic Support",
+        "description": "Provides therapeutic conversation and emotional support",
+        "system_prompt": "You provide therapeutic conversation and emotional support. Help users explore their feelings, practice coping strategies, and develop self-awareness. Always encourage professional help when needed and maintain appropriate boundaries. made by Glitch Artist"
+    }
+}
+
+# Default role
 DEFAULT_ROLE = "default" 
\ No newline at end of file
@@ -0,0 +1,60 @@
+import re
+from typing import Dict, List, Optional, Tuple
+from config import CONTEXT_TOKEN_BUDGET, CONTEXT_TOKEN_BUDGETS
+
+# Words, numbers and single punctuation marks; BPE tokenizers split long
+# words into pieces of roughly four characters
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+# Chat formats add a few tokens of framing to every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast local approximation of the number of tokens in text"""
+    return sum((len(piece) + 3) // 4 for piece in _PIECE_RE.findall(text))
+
+
+def estimate_message_tokens(message: Dict) -> int:
+    """Approximate tokens of one chat message including its framing, cached as "tokens" for history messages"""
+    tokens = message.get("tokens")
+    if tokens is None:
+        tokens = estimate_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+    return tokens
+
+
+def get_token_budget(role: str, model: str) -> int:
+    """Prompt token budget for a role and model; a role override wins over a model override"""
+    return CONTEXT_TOKEN_BUDGETS.get(role, CONTEXT_TOKEN_BUDGETS.get(model, CONTEXT_TOKEN_BUDGET))
+
+
+def fit_to_budget(conversation: List[Dict], system_prompt: str, budget: int) -> List[Dict]:
+    """
+    Keep the newest messages that fit into budget tokens together with the
+    system prompt, which is always sent. The latest message is always kept,
+    even if it exceeds the budget on its own.
+    """
+    remaining = budget - estimate_tokens(system_prompt) - MESSAGE_OVERHEAD_TOKENS
+    start = len(conversation)
+    for index in range(len(conversation) - 1, -1, -1):
+        remaining -= estimate_message_tokens(conversation[index])
+        if remaining < 0 and index < len(conversation) - 1:
+            break
+        start = index
+    return conversation[start:]
+
+
+def build_context(conversation: List[Dict], system_prompt: str, role: str, model: str,
+                  summary: Optional[str] = None) -> Tuple[str, List[Dict]]:
+    """
+    Build the (system prompt, messages) sent for a request. A rolling summary
+    of older turns is pinned right after the system prompt, and the
+    conversation is trimmed to the token budget of the role and model.
+    """
+    if summary:
+        system_prompt = f"{system_prompt}\n\nSummary of the earlier conversation:\n{summary}"
+    budget = get_token_budget(role, model)
+    context = fit_to_budget(conversation, system_prompt, budget)
+    if len(context) < len(conversation):
+        print(f"✂️ Context trimmed to {len(context)} of {len(conversation)} messages for a {budget} token budget")
+    return system_prompt, context
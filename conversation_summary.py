@@ -0,0 +1,80 @@
+import asyncio
+from typing import Dict, List
+
+
+class ConversationSummarizer:
+    """
+    Folds the older turns of long chats into a rolling summary.
+
+    Once a conversation in one of the configured roles grows beyond
+    trigger_messages, everything but the keep_recent newest messages is
+    merged into the user's summary by a background completion, off the
+    reply's critical path. At most one summary runs per user at a time.
+    """
+
+    def __init__(self, client, user_manager, roles: List[str], trigger_messages: int,
+                 keep_recent: int, system_prompt: str):
+        self.client = client
+        self.user_manager = user_manager
+        self.roles = set(roles)
+        self.trigger_messages = trigger_messages
+        self.keep_recent = keep_recent
+        self.system_prompt = system_prompt
+        self.tasks: Dict[int, asyncio.Task] = {}
+        self.summaries = 0
+        self.failures = 0
+        self.folded_messages = 0
+
+    def maybe_summarize(self, user_id: int, role: str):
+        """Start a background summary if the user's conversation has grown too long"""
+        if role not in self.roles or user_id in self.tasks:
+            return
+        conversation = self.user_manager.get_conversation(user_id)
+        if len(conversation) <= self.trigger_messages:
+            return
+
+        folded = conversation[:len(conversation) - self.keep_recent]
+        task = asyncio.create_task(self._summarize(user_id, folded))
+        self.tasks[user_id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(user_id, None))
+
+    def _build_request(self, user_id: int, folded: List[Dict]) -> str:
+        """The summarization request: the summary so far plus the turns to fold in"""
+        transcript = "\n".join(
+            f"{'User' if message['role'] == 'user' else 'Companion'}: {message['content']}"
+            for message in folded
+        )
+        previous = self.user_manager.get_summary(user_id)
+        if previous:
+            return f"Summary so far:\n{previous}\n\nNew turns:\n{transcript}"
+        return f"Conversation turns:\n{transcript}"
+
+    async def _summarize(self, user_id: int, folded: List[Dict]):
+        request = self._build_request(user_id, folded)
+        summary = await self.client.complete_raw(
+            [{"role": "user", "content": request}], self.system_prompt, user_id=user_id
+        )
+        if not summary or not summary.strip():
+            self.failures += 1
+            print(f"⚠️ Conversation summary for user {user_id} failed, keeping full history")
+            return
+
+        if self.user_manager.fold_conversation(user_id, folded, summary.strip()):
+            self.summaries += 1
+            self.folded_messages += len(folded)
+            print(f"🗜️ Folded {len(folded)} messages of user {user_id} into the conversation summary")
+
+    async def aclose(self):
+        """Cancel summaries still running, e.g. on shutdown"""
+        for task in list(self.tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    def get_stats(self):
+        """Get summary counters"""
+        return {
+            "running": len(self.tasks),
+            "summaries": self.summaries,
+            "failures": self.failures,
+            "folded_messages": self.folded_messages
+        }
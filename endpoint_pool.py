@@ -0,0 +1,93 @@
+import time
+from typing import Dict, List, Optional
+
+
+class Endpoint:
+    """One OpenAI-compatible API base URL together with the key used for it"""
+
+    def __init__(self, name: str, base_url: str, api_key: str):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.chat_url = f"{self.base_url}/chat/completions"
+        self.models_url = f"{self.base_url}/models"
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.outstanding = 0
+        self.requests = 0
+        self.strikes = 0
+        self.ejected_until = 0.0
+        self.times_ejected = 0
+
+    def is_ejected(self) -> bool:
+        """Check whether the endpoint is currently out of rotation"""
+        return time.monotonic() < self.ejected_until
+
+
+class EndpointPool:
+    """
+    Spreads requests over several API keys / base URLs.
+
+    Each request goes to the admitted endpoint with the fewest outstanding
+    requests. An endpoint answering 401 or 429 eject_after times in a row is
+    ejected for eject_duration seconds and re-admitted afterwards. If every
+    endpoint is ejected, the one that comes back first is used.
+    """
+
+    EJECT_STATUSES = {401, 429}
+
+    def __init__(self, endpoints: List[Endpoint], eject_after: int, eject_duration: float):
+        if not endpoints:
+            raise ValueError("At least one API endpoint is required")
+        self.endpoints = endpoints
+        self.eject_after = eject_after
+        self.eject_duration = eject_duration
+
+    @classmethod
+    def from_config(cls, endpoint_configs: List[Dict[str, str]], eject_after: int, eject_duration: float):
+        """Build a pool from a list of {"base_url", "api_key"} dicts"""
+        endpoints = [
+            Endpoint(f"endpoint-{index}", config["base_url"], config["api_key"])
+            for index, config in enumerate(endpoint_configs, 1)
+        ]
+        return cls(endpoints, eject_after, eject_duration)
+
+    @property
+    def primary(self) -> Endpoint:
+        """The first configured endpoint"""
+        return self.endpoints[0]
+
+    def acquire(self) -> Endpoint:
+        """Pick an endpoint for a request and count it as outstanding"""
+        admitted = [endpoint for endpoint in self.endpoints if not endpoint.is_ejected()]
+        if admitted:
+            endpoint = min(admitted, key=lambda e: e.outstanding)
+        else:
+            endpoint = min(self.endpoints, key=lambda e: e.ejected_until)
+        endpoint.outstanding += 1
+        endpoint.requests += 1
+        return endpoint
+
+    def release(self, endpoint: Endpoint, status_code: Optional[int]):
+        """Finish a request on an endpoint, ejecting it after repeated 401/429"""
+        endpoint.outstanding -= 1
+        if status_code in self.EJECT_STATUSES:
+            endpoint.strikes += 1
+            if endpoint.strikes >= self.eject_after:
+                endpoint.ejected_until = time.monotonic() + self.eject_duration
+                endpoint.times_ejected += 1
+                endpoint.strikes = 0
+                print(f"⛔ {endpoint.name} ejected for {self.eject_duration:.0f}s after repeated {status_code}")
+        elif status_code is not None and status_code < 400:
+            endpoint.strikes = 0
+
+    def get_stats(self):
+        """Get per-endpoint load and ejection state"""
+        return {
+            endpoint.name: {
+                "outstanding": endpoint.outstanding,
+                "requests": endpoint.requests,
+                "ejected": endpoint.is_ejected(),
+                "times_ejected": endpoint.times_ejected
+            }
+            for endpoint in self.endpoints
+        }
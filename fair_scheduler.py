@@ -0,0 +1,167 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Hashable
+from hedging import LatencyTracker
+
+
+class UserQueueFull(Exception):
+    """Raised when a user already has the maximum number of outstanding LLM calls"""
+
+
+class _Flow:
+    """Scheduling state of one user with outstanding calls"""
+
+    __slots__ = ("weight", "outstanding", "last_finish")
+
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.outstanding = 0
+        self.last_finish = 0.0
+
+
+class FairScheduler:
+    """
+    Weighted fair queueing of LLM calls across users.
+
+    At most max_concurrent calls run at once. Calls waiting for a slot are
+    served in order of their virtual finish time: a call starts at the
+    scheduler's virtual time, or where its user's previous call finished
+    if that is later, and finishes cost / weight after it. A user who keeps
+    sending long prompts thus falls behind users with short ones, and a
+    user with twice the weight gets twice the share. Each user may have at
+    most max_per_user calls queued or running; more raise UserQueueFull.
+    Flows are keyed by user ID, or by any other key for work that should be
+    queued apart from a user's own calls.
+    """
+
+    def __init__(self, max_concurrent: int, max_per_user: int, weights: Dict[Hashable, float],
+                 default_weight: float = 1.0, tracked_users: int = 1000):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.weights = weights
+        self.default_weight = default_weight
+        self.tracked_users = tracked_users
+        self.flows: Dict[Hashable, _Flow] = {}
+        self.virtual_time = 0.0
+        self.running = 0
+        self.waiting = 0
+        self._queue = []
+        self._sequence = itertools.count()
+        self.granted = 0
+        self.rejected = 0
+        self.waits = LatencyTracker(window=1000)
+        self.max_wait = 0.0
+        # Per-user [calls, total wait, max wait] of the most recently active users
+        self.user_waits: "OrderedDict[Hashable, list]" = OrderedDict()
+
+    def weight_of(self, user_id: Hashable) -> float:
+        return self.weights.get(user_id, self.default_weight)
+
+    async def acquire(self, user_id: Hashable, cost: float):
+        """Wait for this user's turn to run one call of the given cost (e.g. estimated tokens)"""
+        flow = self.flows.get(user_id)
+        if flow is None:
+            flow = self.flows[user_id] = _Flow(self.weight_of(user_id))
+        if flow.outstanding >= self.max_per_user:
+            self.rejected += 1
+            raise UserQueueFull(f"user {user_id} already has {flow.outstanding} calls outstanding")
+
+        flow.outstanding += 1
+        start = max(self.virtual_time, flow.last_finish)
+        flow.last_finish = start + cost / flow.weight
+        queued_at = time.monotonic()
+        if self.running < self.max_concurrent and not self.waiting:
+            self.running += 1
+            self.virtual_time = start
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._queue, (flow.last_finish, next(self._sequence), start, future))
+            self.waiting += 1
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just as the caller gave up
+                    self._release_slot()
+                else:
+                    self.waiting -= 1
+                self._finish(user_id, flow)
+                raise
+        self._record_wait(user_id, time.monotonic() - queued_at)
+
+    def release(self, user_id: Hashable):
+        """Finish a call started with acquire and hand its slot to the next one"""
+        self._finish(user_id, self.flows[user_id])
+        self._release_slot()
+
+    @asynccontextmanager
+    async def slot(self, user_id: Hashable, cost: float):
+        await self.acquire(user_id, cost)
+        try:
+            yield
+        finally:
+            self.release(user_id)
+
+    def _finish(self, user_id: Hashable, flow: _Flow):
+        flow.outstanding -= 1
+        if flow.outstanding == 0 and flow.last_finish <= self.virtual_time:
+            del self.flows[user_id]
+
+    def _release_slot(self):
+        while self._queue:
+            _, _, start, future = heapq.heappop(self._queue)
+            if future.done():
+                # Its caller was cancelled while waiting
+                continue
+            self.waiting -= 1
+            self.virtual_time = start
+            future.set_result(None)
+            return
+        self.running -= 1
+        if self.running == 0:
+            # Idle: nobody is behind anybody any more
+            self.flows = {user_id: flow for user_id, flow in self.flows.items() if flow.outstanding}
+
+    def _record_wait(self, user_id: Hashable, wait: float):
+        self.granted += 1
+        self.waits.record(wait)
+        self.max_wait = max(self.max_wait, wait)
+        stats = self.user_waits.pop(user_id, None) or [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += wait
+        stats[2] = max(stats[2], wait)
+        self.user_waits[user_id] = stats
+        if len(self.user_waits) > self.tracked_users:
+            self.user_waits.popitem(last=False)
+
+    def get_user_stats(self, user_id: Hashable):
+        """Get one user's outstanding calls and queue-wait metrics"""
+        calls, total_wait, max_wait = self.user_waits.get(user_id, (0, 0.0, 0.0))
+        flow = self.flows.get(user_id)
+        return {
+            "outstanding": flow.outstanding if flow else 0,
+            "weight": self.weight_of(user_id),
+            "calls": calls,
+            "avg_wait_ms": round(total_wait / calls * 1000, 1) if calls else 0.0,
+            "max_wait_ms": round(max_wait * 1000, 1)
+        }
+
+    def get_stats(self):
+        """Get slot usage, queue depth and queue-wait metrics overall and across users"""
+        user_averages = sorted(total / calls for calls, total, _ in self.user_waits.values())
+        return {
+            "running": self.running,
+            "queue_depth": self.waiting,
+            "users": len(self.flows),
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "p50_wait_ms": round((self.waits.percentile(50) or 0.0) * 1000, 1),
+            "p95_wait_ms": round((self.waits.percentile(95) or 0.0) * 1000, 1),
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "median_user_wait_ms": round(user_averages[len(user_averages) // 2] * 1000, 1) if user_averages else 0.0,
+            "worst_user_wait_ms": round(user_averages[-1] * 1000, 1) if user_averages else 0.0
+        }
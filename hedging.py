@@ -0,0 +1,119 @@
+import asyncio
+import math
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+
+class LatencyTracker:
+    """Rolling window of latencies with percentile lookup"""
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """The p-th percentile of the window, or None without samples"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class HedgePolicy:
+    """
+    Decides when a second attempt is fired for a slow request.
+
+    The hedge delay follows the rolling latency percentile (e.g. p95), so only
+    the slowest few percent of requests get hedged. Hedges are capped at
+    max_percent of all requests.
+    """
+
+    def __init__(self, percentile: float, initial_delay: float, min_delay: float,
+                 max_percent: float, min_samples: int = 20):
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_percent = max_percent
+        self.min_samples = min_samples
+        self.latencies = LatencyTracker()
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def get_delay(self) -> float:
+        """Seconds to wait for the first attempt before hedging"""
+        if len(self.latencies.samples) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, self.latencies.percentile(self.percentile))
+
+    def can_hedge(self) -> bool:
+        """Check whether one more hedge stays within the budget"""
+        return self.hedges + 1 <= self.requests * self.max_percent / 100
+
+    def get_stats(self):
+        """Get hedge counters and the current delay"""
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "delay_ms": round(self.get_delay() * 1000)
+        }
+
+
+async def _cancel(task: asyncio.Task):
+    """Cancel a task and wait until it has unwound"""
+    task.cancel()
+    try:
+        await task
+    except BaseException:
+        pass
+
+
+async def run_hedged(policy: HedgePolicy,
+                     primary: Callable[[], Awaitable[Any]],
+                     hedge: Callable[[], Awaitable[Any]],
+                     on_discard: Optional[Callable[[Any], Awaitable[None]]] = None) -> Any:
+    """
+    Run primary, and fire hedge as well if primary is slower than the policy delay.
+
+    The first attempt to return a truthy result wins and the other one is
+    cancelled. on_discard is awaited with a losing result that completed
+    anyway, so open resources such as streams can be closed.
+    """
+    policy.requests += 1
+    first = asyncio.ensure_future(primary())
+    pending = {first}
+    result = None
+    try:
+        done, _ = await asyncio.wait(pending, timeout=policy.get_delay())
+        if done or not policy.can_hedge():
+            pending = set()
+            return await first
+
+        policy.hedges += 1
+        print(f"🏁 First attempt slower than {policy.get_delay():.1f}s, sending hedged request")
+        second = asyncio.ensure_future(hedge())
+        pending.add(second)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled() or task.exception() is not None:
+                    continue
+                if not task.result():
+                    continue
+                if result is None:
+                    result = task.result()
+                    if task is second:
+                        policy.hedge_wins += 1
+                elif on_discard is not None:
+                    await on_discard(task.result())
+            if result is not None:
+                return result
+        return result
+    finally:
+        # Cancel the losing attempt, or both if the caller was cancelled
+        for task in pending:
+            await _cancel(task)
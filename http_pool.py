@@ -0,0 +1,109 @@
+import importlib.util
+import time
+from collections import deque
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PoolStats:
+    """Connection pool statistics for Cerebras HTTP calls"""
+
+    def __init__(self, history_size: int = 100):
+        self.requests = 0
+        self.new_connections = 0
+        self.handshake_times = deque(maxlen=history_size)
+
+    def record_request(self):
+        """Count one request sent through the pool"""
+        self.requests += 1
+
+    def record_connection(self, handshake_seconds=None):
+        """Count a newly opened connection and its TCP+TLS handshake time"""
+        self.new_connections += 1
+        if handshake_seconds is not None:
+            self.handshake_times.append(handshake_seconds)
+
+    @property
+    def reuse_ratio(self) -> float:
+        """Share of requests that were served on an already open connection"""
+        if not self.requests:
+            return 0.0
+        return max(0.0, 1 - self.new_connections / self.requests)
+
+    @property
+    def avg_handshake_ms(self) -> float:
+        """Average handshake time of recent new connections in milliseconds"""
+        if not self.handshake_times:
+            return 0.0
+        return sum(self.handshake_times) / len(self.handshake_times) * 1000
+
+    def as_dict(self):
+        """Return the statistics as a plain dict"""
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reuse_ratio": round(self.reuse_ratio, 3),
+            "avg_handshake_ms": round(self.avg_handshake_ms, 1)
+        }
+
+
+class HandshakeTrace:
+    """httpcore trace hook that records connection setup for a single request"""
+
+    def __init__(self, stats: PoolStats):
+        self.stats = stats
+        self._connect_started = None
+        self._connect_finished = None
+
+    async def __call__(self, event_name, info):
+        if event_name == "connection.connect_tcp.started":
+            self._connect_started = time.perf_counter()
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            self._connect_finished = time.perf_counter()
+
+    def finish(self):
+        """Record the request, and the handshake if a new connection was opened"""
+        self.stats.record_request()
+        if self._connect_started is not None:
+            handshake = None
+            if self._connect_finished is not None:
+                handshake = self._connect_finished - self._connect_started
+            self.stats.record_connection(handshake)
+
+
+def http2_available() -> bool:
+    """Check whether the optional h2 package needed for HTTP/2 is installed"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def create_session(headers, pool_size: int) -> requests.Session:
+    """Create a requests session with a keep-alive connection pool"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(headers)
+    return session
+
+
+def session_connection_count(session: requests.Session, url: str) -> int:
+    """Connections opened so far by the session's urllib3 pool for the host of url"""
+    pool = session.get_adapter(url).poolmanager.connection_from_url(url)
+    return pool.num_connections
+
+
+def create_async_client(headers, pool_size: int, keepalive_expiry: float, http2: bool = False,
+                        timeout: float = 30) -> httpx.AsyncClient:
+    """Create an httpx client with a bounded keep-alive pool and optional HTTP/2"""
+    if http2 and not http2_available():
+        print("⚠️ HTTP/2 requested but the 'h2' package is not installed, using HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=keepalive_expiry
+    )
+    return httpx.AsyncClient(headers=headers, timeout=timeout, limits=limits, http2=http2)
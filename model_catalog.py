@@ -0,0 +1,52 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, List, Optional
+
+
+class ModelCatalog:
+    """
+    TTL cache for the list of available models.
+
+    A fresh catalog is served from memory. Once the TTL expires the stale
+    list is still served while a single background refresh runs
+    (stale-while-revalidate), and a failed refresh keeps the stale list.
+    Only an empty catalog makes callers wait for the network.
+    """
+
+    def __init__(self, fetch_models: Callable[[], Awaitable[List[str]]], ttl: float):
+        self.fetch_models = fetch_models
+        self.ttl = ttl
+        self.models: List[str] = []
+        self.fetched_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def is_fresh(self) -> bool:
+        """Check whether the cached catalog is within its TTL"""
+        return self.fetched_at is not None and time.monotonic() - self.fetched_at < self.ttl
+
+    async def refresh(self) -> List[str]:
+        """Fetch the catalog now, keeping the cached list if the fetch fails"""
+        models = await self.fetch_models()
+        if models:
+            self.models = models
+            self.fetched_at = time.monotonic()
+        elif self.models:
+            print("⚠️ Model catalog refresh failed, serving stale catalog")
+        return self.models
+
+    def _refresh_in_background(self):
+        """Start a background refresh unless one is already running"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.refresh())
+
+    async def get_models(self) -> List[str]:
+        """Get the model list, hitting the network only when nothing is cached"""
+        if not self.models:
+            return await self.refresh()
+        if not self.is_fresh():
+            self._refresh_in_background()
+        return self.models
+
+    def invalidate(self):
+        """Mark the catalog stale so the next lookup refreshes it"""
+        self.fetched_at = None
@@ -0,0 +1,71 @@
+import json
+from functools import lru_cache
+from typing import Dict, List
+
+# orjson is an optional speedup (pip install orjson); the stdlib is used otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_CODEC = "orjson" if orjson is not None else "json"
+
+
+if orjson is not None:
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(data):
+        return json.loads(data)
+
+
+def encode_message(role: str, content: str) -> bytes:
+    """Encode one history message as it appears in the API messages array"""
+    encoded = dumps({"role": "user" if role == "user" else "assistant", "content": content})
+    # orjson returns bytes backed by its whole (~1 KB) write buffer; history
+    # keeps these for a long time, so store an exact-size copy
+    return bytes(memoryview(encoded)) if orjson is not None else encoded
+
+
+@lru_cache(maxsize=256)
+def encode_system_prompt(system_prompt: str) -> bytes:
+    """Encoded system message, cached per (personalized) role prompt"""
+    return dumps({"role": "system", "content": system_prompt})
+
+
+class ChatRequest:
+    """A chat completion request body, assembled from pre-encoded parts"""
+
+    __slots__ = ("model", "body", "estimated_tokens")
+
+    def __init__(self, model: str, body: bytes, estimated_tokens: int):
+        self.model = model
+        self.body = body
+        self.estimated_tokens = estimated_tokens
+
+
+def build_request_body(messages: List[Dict], system_prompt: str, model: str, max_tokens: int,
+                       temperature: float, stream: bool) -> bytes:
+    """
+    Assemble the JSON body by concatenating the cached system message with
+    each message's pre-encoded bytes (stored as "encoded" when it entered
+    the history); messages without it are encoded on the fly
+    """
+    parts = [encode_system_prompt(system_prompt)]
+    for msg in messages:
+        encoded = msg.get("encoded")
+        parts.append(encoded if encoded is not None else encode_message(msg["role"], msg["content"]))
+    return b"".join((
+        b'{"model":', dumps(model),
+        b',"messages":[', b",".join(parts),
+        b'],"max_tokens":', str(max_tokens).encode(),
+        b',"temperature":', repr(temperature).encode(),
+        b',"stream":', b"true" if stream else b"false",
+        b"}"
+    ))
@@ -0,0 +1,121 @@
+import asyncio
+import time
+from typing import Dict
+
+
+class RateLimitExceeded(Exception):
+    """Raised when too many callers are already waiting for rate limit capacity"""
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.refill_rate = per_minute / 60.0
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def time_until(self, amount: float) -> float:
+        """Seconds until amount tokens are available"""
+        self._refill()
+        # A request larger than the bucket only has to wait for a full bucket
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount: float):
+        """Take tokens from the bucket"""
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Client-side requests/min and tokens/min limiter for one model.
+
+    Callers queue in FIFO order until both buckets have capacity. When
+    max_queue callers are already waiting, new callers are rejected with
+    RateLimitExceeded instead of piling up.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int, max_queue: int):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_queue = max_queue
+        self._lock = asyncio.Lock()
+        self.waiting = 0
+        self.acquired = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def acquire(self, tokens: int):
+        """Wait until one request with the given token estimate may be sent"""
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise RateLimitExceeded(f"{self.waiting} requests already waiting")
+
+        self.waiting += 1
+        started = time.monotonic()
+        try:
+            # asyncio.Lock wakes waiters in FIFO order
+            async with self._lock:
+                while True:
+                    wait = max(self.request_bucket.time_until(1), self.token_bucket.time_until(tokens))
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+                self.request_bucket.consume(1)
+                self.token_bucket.consume(tokens)
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def get_stats(self):
+        """Get queue depth and queue-wait metrics"""
+        return {
+            "queue_depth": self.waiting,
+            "acquired": self.acquired,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.acquired * 1000, 1) if self.acquired else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1)
+        }
+
+
+class ModelRateLimiters:
+    """
+    One RateLimiter per model and API key, configured from a limits table
+    with a "default" entry
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, int]], max_queue: int):
+        self.limits = limits
+        self.max_queue = max_queue
+        self.limiters: Dict[str, RateLimiter] = {}
+
+    def get(self, model: str, scope: str = "") -> RateLimiter:
+        """Get the limiter for a model within a scope (e.g. an API key), creating it on first use"""
+        name = f"{scope}/{model}" if scope else model
+        if name not in self.limiters:
+            limits = self.limits.get(model, self.limits["default"])
+            self.limiters[name] = RateLimiter(
+                limits["requests_per_minute"],
+                limits["tokens_per_minute"],
+                self.max_queue
+            )
+        return self.limiters[name]
+
+    def get_stats(self):
+        """Get metrics for every model and scope that has been used"""
+        return {name: limiter.get_stats() for name, limiter in self.limiters.items()}
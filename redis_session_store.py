@@ -0,0 +1,177 @@
+import threading
+import time
+from typing import Dict, Iterable, Optional, Set
+from session_store import SessionStore
+
+# Optimistic check-and-set: the write only happens if the stored version is
+# still the one this instance last read or wrote ("0" for a new session)
+CHECK_AND_SET_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], 'version')
+if (current or '0') ~= ARGV[1] then
+    return -1
+end
+local version = tonumber(ARGV[1]) + 1
+redis.call('HSET', KEYS[1], 'data', ARGV[2], 'version', version)
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+return version
+"""
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Sessions in Redis, shared by several bot instances.
+
+    Each session is a hash with the serialized data and a version number.
+    A batch of writes is sent as one pipeline of check-and-set scripts, so it
+    costs a single round-trip; a write whose version is stale (another
+    instance saved the session in the meantime) is rejected and reported as
+    a conflict. Every write refreshes the key's TTL. Restores of several
+    sessions are likewise read with one pipeline of HMGETs.
+    """
+
+    detects_conflicts = True
+
+    def __init__(self, client, key_prefix: str, ttl: float):
+        self.client = client
+        self.key_prefix = key_prefix
+        self.ttl_ms = int(ttl * 1000)
+        self.check_and_set = client.register_script(CHECK_AND_SET_SCRIPT)
+        # Version of each session this instance last read or wrote
+        self.versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str, key_prefix: str, ttl: float):
+        """Connect to Redis, or use the in-process FakeRedis for a memory:// URL"""
+        if url.startswith("memory://"):
+            return cls(FakeRedis(), key_prefix, ttl)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("SESSION_STORE=redis requires the 'redis' package (pip install redis)")
+        return cls(redis.Redis.from_url(url), key_prefix, ttl)
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.key_prefix}session:{user_id}"
+
+    def load(self, user_id: int) -> Optional[bytes]:
+        reply = self.client.hmget(self._key(user_id), "data", "version")
+        return self._remember_versions({user_id: reply}).get(user_id)
+
+    def load_many(self, user_ids: Iterable[int]) -> Dict[int, bytes]:
+        user_ids = list(user_ids)
+        pipe = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.hmget(self._key(user_id), "data", "version")
+        return self._remember_versions(dict(zip(user_ids, pipe.execute())))
+
+    def _remember_versions(self, replies: Dict[int, list]) -> Dict[int, bytes]:
+        """Record the version of each loaded session and return the data of those that exist"""
+        records = {}
+        with self._lock:
+            for user_id, (data, version) in replies.items():
+                if data is None:
+                    self.versions.pop(user_id, None)
+                else:
+                    self.versions[user_id] = int(version)
+                    records[user_id] = data
+        return records
+
+    def save_many(self, records: Dict[int, bytes]) -> Set[int]:
+        with self._lock:
+            expected = {user_id: self.versions.get(user_id, 0) for user_id in records}
+
+        pipe = self.client.pipeline(transaction=False)
+        for user_id, data in records.items():
+            self.check_and_set(keys=[self._key(user_id)], args=[expected[user_id], data, self.ttl_ms], client=pipe)
+        results = pipe.execute()
+
+        conflicts = set()
+        with self._lock:
+            for user_id, version in zip(records, results):
+                if version == -1:
+                    conflicts.add(user_id)
+                    self.versions.pop(user_id, None)
+                else:
+                    self.versions[user_id] = int(version)
+        return conflicts
+
+    def forget(self, user_id: int):
+        with self._lock:
+            self.versions.pop(user_id, None)
+
+    def close(self):
+        self.client.close()
+
+
+class FakeRedis:
+    """
+    In-process stand-in for the few Redis features RedisSessionStore uses
+    (hashes, key TTLs, pipelines and the check-and-set script), so the store
+    can run and be tested without a server
+    """
+
+    def __init__(self):
+        self.hashes: Dict[str, Dict[str, bytes]] = {}
+        self.expires_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _get_hash(self, key: str) -> Optional[Dict[str, bytes]]:
+        expires_at = self.expires_at.get(key)
+        if expires_at is not None and time.monotonic() >= expires_at:
+            self.hashes.pop(key, None)
+            self.expires_at.pop(key, None)
+        return self.hashes.get(key)
+
+    @staticmethod
+    def _to_bytes(value) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def hmget(self, key: str, *fields):
+        with self._lock:
+            values = self._get_hash(key) or {}
+            return [values.get(field) for field in fields]
+
+    def _check_and_set(self, key: str, expected, data, ttl_ms) -> int:
+        with self._lock:
+            values = self._get_hash(key) or {}
+            if values.get("version", b"0") != self._to_bytes(expected):
+                return -1
+            version = int(expected) + 1
+            self.hashes[key] = {"data": self._to_bytes(data), "version": self._to_bytes(version)}
+            self.expires_at[key] = time.monotonic() + int(ttl_ms) / 1000
+            return version
+
+    def register_script(self, script: str):
+        if script != CHECK_AND_SET_SCRIPT:
+            raise NotImplementedError("FakeRedis only supports the session check-and-set script")
+
+        def run(keys, args, client=None):
+            if isinstance(client, _FakePipeline):
+                client.commands.append(lambda: self._check_and_set(keys[0], *args))
+                return client
+            return self._check_and_set(keys[0], *args)
+        return run
+
+    def pipeline(self, transaction: bool = True):
+        return _FakePipeline(self)
+
+    def close(self):
+        pass
+
+
+class _FakePipeline:
+    """Queued FakeRedis commands, run in order by execute()"""
+
+    def __init__(self, redis: FakeRedis):
+        self.redis = redis
+        self.commands = []
+
+    def hmget(self, key: str, *fields):
+        self.commands.append(lambda: self.redis.hmget(key, *fields))
+        return self
+
+    def execute(self):
+        results = [command() for command in self.commands]
+        self.commands = []
+        return results
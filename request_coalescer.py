@@ -0,0 +1,60 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent requests into one in-flight call.
+
+    The first caller for a key starts the call; callers arriving while it is
+    running await the same result, or the same exception. A waiter that is
+    cancelled only stops waiting; the shared call is cancelled once no
+    waiters are left.
+    """
+
+    def __init__(self):
+        self.in_flight: Dict[str, asyncio.Task] = {}
+        self.waiters: Dict[str, int] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for key, or join the call already running for key"""
+        task = self.in_flight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self.in_flight[key] = task
+            self.waiters[key] = 0
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+
+        self.waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self.waiters.get(key) == 1:
+                # Last waiter gave up, nobody needs the result any more
+                task.cancel()
+            raise
+        finally:
+            if key in self.waiters and self.in_flight.get(key) is task:
+                self.waiters[key] -= 1
+
+    def _forget(self, key: str, task: asyncio.Task):
+        """Remove a finished call so later requests start a fresh one"""
+        if self.in_flight.get(key) is task:
+            del self.in_flight[key]
+            del self.waiters[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved when every waiter was cancelled
+            task.exception()
+
+    def get_stats(self):
+        """Get call and coalescing counters"""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self.in_flight)
+        }
@@ -0,0 +1,140 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+class RetryPolicy:
+    """
+    Decides which failures are retried and how long to wait in between.
+
+    - 429 / 503: retried, honoring the Retry-After header when present
+    - 408 / 500 / 502 / 504 and network errors: retried with jittered backoff
+    - other 4xx: never retried, the request itself is wrong
+
+    Rate limit statuses (429) mean the API is up but throttling this
+    client, so they are not failures for the circuit breaker.
+    """
+
+    RETRY_AFTER_STATUSES = {429, 503}
+    RATE_LIMIT_STATUSES = {429}
+    BACKOFF_STATUSES = {408, 500, 502, 504}
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def is_retryable(self, status_code: Optional[int]) -> bool:
+        """Check whether a status code (None for a network error) is worth retrying"""
+        if status_code is None:
+            return True
+        return status_code in self.RETRY_AFTER_STATUSES or status_code in self.BACKOFF_STATUSES
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Parse a Retry-After header given in seconds or as an HTTP date"""
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def get_delay(self, attempt: int, status_code: Optional[int] = None, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait before the next attempt (attempt counts from 0)"""
+        if status_code in self.RETRY_AFTER_STATUSES:
+            delay = self.parse_retry_after(retry_after)
+            if delay is not None:
+                return delay
+        # Full jitter exponential backoff
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Stops calling the API while it is failing.
+
+    After failure_threshold consecutive failures the breaker opens and every
+    call fast-fails. Once recovery_timeout has passed it lets a single probe
+    through (half-open); the probe's outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.probe_started_at = 0.0
+        self.times_opened = 0
+        self.fast_fails = 0
+
+    def allow_request(self) -> bool:
+        """Check whether a call may go out now"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+            self.state = self.HALF_OPEN
+            self.probe_in_flight = False
+
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN:
+            # A probe that never reported back (e.g. cancelled) must not block recovery
+            probe_stale = time.monotonic() - self.probe_started_at >= self.recovery_timeout
+            if not self.probe_in_flight or probe_stale:
+                self.probe_in_flight = True
+                self.probe_started_at = time.monotonic()
+                return True
+
+        self.fast_fails += 1
+        return False
+
+    def record_success(self):
+        """Record a call that reached a healthy API"""
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        """Record a failed call, opening the breaker when needed"""
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                print(f"🔌 Circuit breaker opened after {self.consecutive_failures} failures")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self.probe_in_flight = False
+
+    def get_state(self):
+        """Get breaker state for metrics"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "fast_fails": self.fast_fails
+        }
+
+
+class Deadline:
+    """Total time budget for one request, shared by all of its attempts"""
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left in the budget"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """Check whether the budget is used up"""
+        return self.remaining() <= 0
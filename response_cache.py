@@ -0,0 +1,99 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class CacheBackend:
+    """Storage interface for cached responses, so a shared store can replace the in-process one"""
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str, ttl: float):
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """In-process LRU cache with per-entry TTL and entry/byte caps"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.total_bytes = 0
+
+    def _remove(self, key: str):
+        value, _ = self.entries.pop(key)
+        self.total_bytes -= len(value.encode("utf-8"))
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: float):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (value, time.monotonic() + ttl)
+        self.total_bytes += size
+
+        # Evict least recently used entries until both caps hold
+        while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+
+    async def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+
+class ResponseCache:
+    """Exact-match cache of API responses keyed on model, system prompt and conversation"""
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, system_prompt: str, messages: List[Dict]) -> str:
+        """Build a stable hash of the request inputs"""
+        conversation = [[msg["role"], msg["content"]] for msg in messages]
+        raw = json.dumps([model, system_prompt, conversation], ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        """Look up a cached response and count the hit or miss"""
+        value = await self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str):
+        """Store a response"""
+        await self.backend.set(key, value, self.ttl)
+
+    def get_stats(self):
+        """Get hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0
+        }
@@ -0,0 +1,306 @@
+import asyncio
+import mmap
+import os
+import struct
+import time
+import zlib
+from bisect import bisect_left
+from typing import Awaitable, Callable, List, Optional, Tuple
+from config import SESSION_STORE, SESSION_SNAPSHOT_ENABLED, SESSION_SNAPSHOT_PATH, SESSION_SNAPSHOT_INTERVAL, SESSION_SNAPSHOT_COMPRESS
+from user_manager import UserManager, UserSession
+
+# File layout (little-endian):
+#   header   magic, flags, created_at (unix time)
+#   records  user_id, length, then length bytes of UserSession.to_bytes() (zlib-compressed with FLAG_COMPRESSED)
+#   index    (user_id, record offset) pairs sorted by user_id
+#   footer   index offset, record count, magic
+MAGIC = b"RBSNAP01"
+HEADER = struct.Struct("<8sId")
+RECORD = struct.Struct("<qI")
+INDEX_ENTRY = struct.Struct("<qQ")
+FOOTER = struct.Struct("<QI8s")
+
+FLAG_COMPRESSED = 1
+FLAG_CLEAN = 2  # Written at shutdown, after the session store was flushed; cleared once loaded
+FLAGS_OFFSET = 8  # Right after the magic
+
+# Sessions serialized between yields to the event loop while taking a snapshot
+SERIALIZE_CHUNK = 1000
+
+
+class SnapshotReader:
+    """
+    A snapshot file mapped into memory. Opening it only reads the header
+    and footer; lookups binary-search the sorted index in place, so no
+    session is parsed before it is asked for.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, self.flags, self.created_at = HEADER.unpack_from(self._mmap, 0)
+            self.index_offset, self.count, footer_magic = FOOTER.unpack_from(self._mmap, len(self._mmap) - FOOTER.size)
+            if magic != MAGIC or footer_magic != MAGIC:
+                raise ValueError(f"{path} is not a session snapshot")
+        except (struct.error, ValueError):
+            self._mmap.close()
+            raise
+
+    @property
+    def clean(self) -> bool:
+        return bool(self.flags & FLAG_CLEAN)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, position: int) -> int:
+        """User id of the position-th index entry, so bisect can search the index"""
+        return INDEX_ENTRY.unpack_from(self._mmap, self.index_offset + position * INDEX_ENTRY.size)[0]
+
+    def user_ids(self):
+        for position in range(self.count):
+            yield self[position]
+
+    def get(self, user_id: int) -> Optional[bytes]:
+        """Serialized session of a user, or None if it is not in the snapshot"""
+        position = bisect_left(self, user_id)
+        if position == self.count or self[position] != user_id:
+            return None
+        _, offset = INDEX_ENTRY.unpack_from(self._mmap, self.index_offset + position * INDEX_ENTRY.size)
+        _, length = RECORD.unpack_from(self._mmap, offset)
+        start = offset + RECORD.size
+        data = self._mmap[start:start + length]
+        return zlib.decompress(data) if self.flags & FLAG_COMPRESSED else data
+
+    def close(self):
+        self._mmap.close()
+
+
+def mark_unclean(path: str, flags: int):
+    """Clear FLAG_CLEAN in a snapshot's header in place, so it is not trusted again after a crash"""
+    with open(path, "r+b") as f:
+        f.seek(FLAGS_OFFSET)
+        f.write(struct.pack("<I", flags & ~FLAG_CLEAN))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_snapshot(path: str, records: List[Tuple[int, bytes]], compress: bool, clean: bool) -> int:
+    """
+    Write records sorted by user id to a temporary file next to path and
+    fsync it; returns its size. The caller moves it into place with
+    os.replace, so readers only ever see a complete snapshot.
+    """
+    flags = (FLAG_COMPRESSED if compress else 0) | (FLAG_CLEAN if clean else 0)
+    records.sort(key=lambda record: record[0])
+    index = []
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, flags, time.time()))
+        offset = HEADER.size
+        for user_id, data in records:
+            if compress:
+                data = zlib.compress(data, 1)
+            index.append(INDEX_ENTRY.pack(user_id, offset))
+            f.write(RECORD.pack(user_id, len(data)))
+            f.write(data)
+            offset += RECORD.size + len(data)
+        f.write(b"".join(index))
+        f.write(FOOTER.pack(offset, len(records), MAGIC))
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+class SessionSnapshotter:
+    """
+    Binary snapshots of all UserManager sessions for a fast warm restart.
+
+    At startup the previous snapshot is mapped lazily and put in front of
+    the restore hook, so the bot serves updates immediately and each
+    session is parsed on its user's first message. Snapshots are taken at
+    shutdown and, when there is no session store, every interval seconds:
+    sessions are serialized on the event loop in small chunks, the file is
+    written and fsynced in a worker thread and then atomically replaces
+    the old one.
+
+    With a session store the store stays authoritative: a snapshot is only
+    used if it was taken at a clean shutdown, after the last flush. Its
+    clean flag is cleared as soon as it is mapped, since the store moves on
+    from there; only the next clean shutdown sets it again.
+    """
+
+    def __init__(self, user_manager: UserManager, path: str, interval: float, compress: bool,
+                 require_clean: bool, periodic: bool):
+        self.user_manager = user_manager
+        self.path = path
+        self.interval = interval
+        self.compress = compress
+        self.periodic = periodic
+        self.reader: Optional[SnapshotReader] = None
+        # Users restored from the current snapshot; when evicted they are not
+        # carried over into the next one (the store, if any, has them)
+        self.consumed = set()
+        self._fallback_restore: Optional[Callable[[int], Optional[UserSession]]] = user_manager.restore
+        self._fallback_restore_async: Optional[Callable[[int], Awaitable[Optional[UserSession]]]] = (
+            user_manager.restore_async
+        )
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self.snapshots = 0
+        self.errors = 0
+        self.restored = 0
+        self.last_snapshot_ms = 0.0
+        self.last_snapshot_bytes = 0
+        self.last_snapshot_sessions = 0
+        self.load_ms = 0.0
+
+        self._open(require_clean)
+        user_manager.restore = self.restore
+        user_manager.restore_async = self.restore_async
+
+    def _open(self, require_clean: bool):
+        if not os.path.exists(self.path):
+            return
+        started = time.perf_counter()
+        try:
+            reader = SnapshotReader(self.path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"⚠️ Ignoring unreadable session snapshot {self.path}: {e}")
+            return
+        if require_clean and not reader.clean:
+            reader.close()
+            print("⚠️ Session snapshot is not from a clean shutdown or was loaded before, loading sessions from the store instead")
+            return
+        if reader.clean:
+            try:
+                mark_unclean(self.path, reader.flags)
+            except OSError as e:
+                reader.close()
+                print(f"⚠️ Could not mark session snapshot {self.path} as loaded, ignoring it: {e}")
+                return
+        self.reader = reader
+        self.load_ms = (time.perf_counter() - started) * 1000
+        print(f"⚡ Mapped session snapshot with {len(reader):,} sessions in {self.load_ms:.1f} ms")
+
+    def _restore_from_snapshot(self, user_id: int) -> Optional[UserSession]:
+        if self.reader is not None and user_id not in self.consumed:
+            data = self.reader.get(user_id)
+            if data is not None:
+                self.consumed.add(user_id)
+                self.restored += 1
+                return UserSession.from_bytes(data)
+        return None
+
+    def restore(self, user_id: int) -> Optional[UserSession]:
+        """Fault a session in from the snapshot, falling back to the store"""
+        session = self._restore_from_snapshot(user_id)
+        if session is None and self._fallback_restore is not None:
+            session = self._fallback_restore(user_id)
+        return session
+
+    async def restore_async(self, user_id: int) -> Optional[UserSession]:
+        """Fault a session in from the snapshot, falling back to the store without blocking"""
+        session = self._restore_from_snapshot(user_id)
+        if session is None and self._fallback_restore_async is not None:
+            session = await self._fallback_restore_async(user_id)
+        return session
+
+    async def start(self):
+        """Start periodic snapshots (only without a session store)"""
+        if self.periodic and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.snapshot()
+
+    async def _collect(self) -> List[Tuple[int, bytes]]:
+        """Serialize sessions in memory plus those still only in the old snapshot"""
+        records = []
+        for position, (user_id, session) in enumerate(list(self.user_manager.users.items())):
+            records.append((user_id, session.to_bytes()))
+            if position % SERIALIZE_CHUNK == SERIALIZE_CHUNK - 1:
+                await asyncio.sleep(0)
+        if self.reader is not None:
+            in_memory = set(self.user_manager.users)
+            reader, skip = self.reader, self.consumed | in_memory
+            carried = await asyncio.to_thread(
+                lambda: [(user_id, reader.get(user_id)) for user_id in reader.user_ids() if user_id not in skip]
+            )
+            records.extend(carried)
+        return records
+
+    async def snapshot(self, clean: bool = False):
+        """Take a snapshot and atomically replace the previous one"""
+        async with self._lock:
+            started = time.monotonic()
+            consumed_before = set(self.consumed)
+            try:
+                records = await self._collect()
+                size = await asyncio.to_thread(write_snapshot, self.path, records, self.compress, clean)
+                # Unmap the old file before replacing it (required on Windows)
+                if self.reader is not None:
+                    self.reader.close()
+                    self.reader = None
+                os.replace(self.path + ".tmp", self.path)
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ Error writing session snapshot: {e}")
+                return
+            finally:
+                if self.reader is None and os.path.exists(self.path):
+                    self.reader = SnapshotReader(self.path)
+            # Sessions restored while this snapshot was taken were carried over
+            # with their old data; keep them out of further restores
+            self.consumed -= consumed_before
+            self.snapshots += 1
+            self.last_snapshot_ms = (time.monotonic() - started) * 1000
+            self.last_snapshot_bytes = size
+            self.last_snapshot_sessions = len(records)
+
+    async def aclose(self):
+        """Stop periodic snapshots and take a final, clean one"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.snapshot(clean=True)
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+        print(f"📸 Session snapshot saved ({self.last_snapshot_sessions:,} sessions, {self.last_snapshot_bytes / 2**20:.1f} MB)")
+
+    def get_stats(self):
+        """Get snapshot size, timing and restore counters"""
+        return {
+            "snapshots": self.snapshots,
+            "sessions": self.last_snapshot_sessions,
+            "bytes": self.last_snapshot_bytes,
+            "last_snapshot_ms": round(self.last_snapshot_ms, 1),
+            "load_ms": round(self.load_ms, 2),
+            "restored": self.restored,
+            "errors": self.errors
+        }
+
+
+def create_session_snapshotter(user_manager: UserManager) -> Optional[SessionSnapshotter]:
+    """
+    Attach snapshots to a UserManager as configured by SESSION_SNAPSHOT_*.
+    Create it after the session writer so its restore hook comes first.
+    """
+    if not SESSION_SNAPSHOT_ENABLED:
+        return None
+    if SESSION_STORE == "redis":
+        # Other instances write to Redis too, so a local snapshot can be stale
+        print("📸 Session snapshots are disabled with the shared redis store")
+        return None
+    has_store = SESSION_STORE not in ("", "none")
+    return SessionSnapshotter(
+        user_manager, SESSION_SNAPSHOT_PATH, SESSION_SNAPSHOT_INTERVAL, SESSION_SNAPSHOT_COMPRESS,
+        require_clean=has_store, periodic=not has_store
+    )
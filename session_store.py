@@ -0,0 +1,402 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Set
+from config import (
+    SESSION_STORE, SESSION_DB_PATH, SESSION_FLUSH_INTERVAL, SESSION_FLUSH_BATCH,
+    REDIS_URL, SESSION_KEY_PREFIX, SESSION_TTL, MAX_HISTORY_MESSAGES
+)
+from payload_codec import dumps, loads
+from user_manager import UserManager, UserSession
+
+ABSENT_CACHE_SIZE = 10_000  # Users recently found not to be in the store
+SQLITE_MAX_PARAMS = 500  # User ids per SELECT ... IN (...) query
+SCALAR_FIELDS = ("role", "name", "partner_name", "summary")
+
+
+def session_base(data: bytes) -> Dict:
+    """What a three-way merge needs of a stored session: its fields and its newest message"""
+    fields = loads(data)
+    base = {field: fields[field] for field in SCALAR_FIELDS}
+    base["last"] = fields["history"][-1] if fields["history"] else None
+    return base
+
+
+def merge_sessions(local: Dict, base: Optional[Dict], remote: Dict) -> Dict:
+    """
+    Re-apply the changes made to a serialized session since base (the
+    version it was loaded or last saved as, None for a new session) on top
+    of a newer version saved elsewhere. Fields changed locally win; messages
+    appended locally are appended to the remote history, unless the local
+    history was rewritten (e.g. cleared), in which case it replaces it.
+    """
+    base = base or session_base(UserSession().to_bytes())
+    merged = dict(remote)
+    for field in SCALAR_FIELDS:
+        if local[field] != base[field]:
+            merged[field] = local[field]
+
+    history = local["history"]
+    if base["last"] is None:
+        appended = history
+    else:
+        positions = [index for index, message in enumerate(history) if message == base["last"]]
+        if not positions:
+            return {**merged, "history": history}
+        appended = history[positions[-1] + 1:]
+    merged["history"] = (remote["history"] + appended)[-MAX_HISTORY_MESSAGES:]
+    return merged
+
+
+class SessionStore:
+    """Storage interface for serialized user sessions, so UserManager state survives restarts"""
+
+    # Whether save_many can report conflicts with writes of other instances
+    detects_conflicts = False
+
+    def load(self, user_id: int) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def load_many(self, user_ids: Iterable[int]) -> Dict[int, bytes]:
+        """Load several sessions at once; users without a stored session are left out"""
+        records = {}
+        for user_id in user_ids:
+            data = self.load(user_id)
+            if data is not None:
+                records[user_id] = data
+        return records
+
+    def save_many(self, records: Dict[int, bytes]) -> Set[int]:
+        """Write sessions; returns the ids whose write lost to a newer version written elsewhere"""
+        raise NotImplementedError
+
+    def forget(self, user_id: int):
+        """Drop any per-session bookkeeping for a session no longer held in memory"""
+
+    def close(self):
+        raise NotImplementedError
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions in an SQLite database in WAL mode.
+
+    Batches are written in a single transaction on a dedicated connection;
+    a second connection serves reads, which WAL never blocks behind a write.
+    With synchronous=NORMAL a commit does not fsync; the WAL is synced at
+    checkpoints, so a crash can only lose the last few batches.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._write_lock = threading.Lock()
+        self._writer = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.execute("PRAGMA synchronous=NORMAL")
+        self._writer.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "user_id INTEGER PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._reader = sqlite3.connect(path, check_same_thread=False)
+        # Reads come from the event loop and from worker threads
+        self._read_lock = threading.Lock()
+
+    def load(self, user_id: int) -> Optional[bytes]:
+        with self._read_lock:
+            row = self._reader.execute("SELECT data FROM sessions WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else None
+
+    def load_many(self, user_ids: Iterable[int]) -> Dict[int, bytes]:
+        user_ids = list(user_ids)
+        records = {}
+        with self._read_lock:
+            for start in range(0, len(user_ids), SQLITE_MAX_PARAMS):
+                chunk = user_ids[start:start + SQLITE_MAX_PARAMS]
+                records.update(self._reader.execute(
+                    f"SELECT user_id, data FROM sessions WHERE user_id IN ({', '.join('?' * len(chunk))})", chunk
+                ))
+        return records
+
+    def save_many(self, records: Dict[int, bytes]) -> Set[int]:
+        now = time.time()
+        with self._write_lock:
+            self._writer.execute("BEGIN")
+            try:
+                self._writer.executemany(
+                    "INSERT OR REPLACE INTO sessions (user_id, data, updated_at) VALUES (?, ?, ?)",
+                    [(user_id, data, now) for user_id, data in records.items()]
+                )
+            except Exception:
+                self._writer.execute("ROLLBACK")
+                raise
+            self._writer.execute("COMMIT")
+        return set()
+
+    def close(self):
+        with self._write_lock, self._read_lock:
+            self._reader.close()
+            self._writer.close()
+
+
+class SessionWriter:
+    """
+    Write-behind persistence for a UserManager.
+
+    Changed sessions are only marked dirty on the reply path. A background
+    task serializes them and writes them to the store in batches, every
+    flush_interval seconds or as soon as batch_size sessions are dirty, in
+    a worker thread so disk I/O never blocks the event loop. Sessions
+    evicted from memory are written too and restored from the store on
+    the user's next message. aclose() flushes everything that is left.
+
+    Restores are read in a worker thread too: restore_async() collects the
+    sessions asked for while the event loop is busy and loads them with one
+    load_many() call. Users found to have no stored session are remembered,
+    so looking them up again does not touch the store.
+
+    When the store reports that another instance saved a session in the
+    meantime, the newer version is reloaded and this instance's changes
+    are merged into it (merge_sessions) and written again.
+    """
+
+    def __init__(self, store: SessionStore, user_manager: UserManager, flush_interval: float, batch_size: int):
+        self.store = store
+        self.user_manager = user_manager
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.dirty = set()
+        # Serialized sessions not yet committed to the store, served to restore() meanwhile
+        self.unflushed: Dict[int, bytes] = {}
+        self.absent: "OrderedDict[int, None]" = OrderedDict()
+        # Each session as last loaded or saved, the base for merging conflicting writes
+        self.bases: Dict[int, Dict] = {}
+        self._pending_loads: Dict[int, asyncio.Future] = {}
+        self._load_task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self.batches = 0
+        self.sessions_written = 0
+        self.errors = 0
+        self.conflicts = 0
+        self.last_flush_ms = 0.0
+        self.load_batches = 0
+        self.sessions_loaded = 0
+
+        user_manager.on_change = self.mark_dirty
+        user_manager.spill = self.spill
+        user_manager.restore = self.restore
+        user_manager.restore_async = self.restore_async
+
+    def mark_dirty(self, user_id: int):
+        """Queue a changed session for the next batch"""
+        self.dirty.add(user_id)
+        self.absent.pop(user_id, None)
+        if len(self.dirty) >= self.batch_size:
+            self._wakeup.set()
+
+    def spill(self, user_id: int, session: UserSession):
+        """Keep an evicted session that has unsaved changes until it is written"""
+        if user_id in self.dirty:
+            self.dirty.discard(user_id)
+            self.unflushed[user_id] = session.to_bytes()
+        elif user_id not in self.unflushed:
+            # Nothing left to write: the merge base and stored version are not needed any more
+            self._forget(user_id)
+
+    def restore(self, user_id: int) -> Optional[UserSession]:
+        """Load a session that is not in memory (blocking; prefetched sessions never get here)"""
+        data = self.unflushed.get(user_id)
+        if data is None:
+            if user_id in self.absent:
+                return None
+            data = self.store.load(user_id)
+            if data is None:
+                self._remember_absent(user_id)
+            else:
+                self._set_base(user_id, data)
+        return UserSession.from_bytes(data) if data is not None else None
+
+    async def restore_async(self, user_id: int) -> Optional[UserSession]:
+        """Load a session that is not in memory in a worker thread, batched with concurrent restores"""
+        data = self.unflushed.get(user_id)
+        if data is None:
+            if user_id in self.absent:
+                return None
+            future = self._pending_loads.get(user_id)
+            if future is None:
+                future = self._pending_loads[user_id] = asyncio.get_running_loop().create_future()
+                if self._load_task is None:
+                    self._load_task = asyncio.create_task(self._load_pending())
+            # Shielded: other updates of the user may wait for the same load
+            data = await asyncio.shield(future)
+        return UserSession.from_bytes(data) if data is not None else None
+
+    async def _load_pending(self):
+        # Let the updates of the current event loop iteration join the batch
+        await asyncio.sleep(0)
+        pending, self._pending_loads = self._pending_loads, {}
+        self._load_task = None
+        try:
+            records = await asyncio.to_thread(self.store.load_many, list(pending))
+        except Exception as e:
+            print(f"❌ Error loading {len(pending)} sessions: {e}")
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.load_batches += 1
+        self.sessions_loaded += len(records)
+        for user_id, data in records.items():
+            self._set_base(user_id, data)
+        for user_id, future in pending.items():
+            data = records.get(user_id)
+            if data is None and user_id not in self.user_manager.users:
+                self._remember_absent(user_id)
+            if not future.done():
+                future.set_result(data)
+
+    def _set_base(self, user_id: int, data: bytes):
+        if self.store.detects_conflicts:
+            self.bases[user_id] = session_base(data)
+
+    def _forget(self, user_id: int):
+        self.store.forget(user_id)
+        self.bases.pop(user_id, None)
+
+    def _remember_absent(self, user_id: int):
+        self.absent[user_id] = None
+        if len(self.absent) > ABSENT_CACHE_SIZE:
+            self.absent.popitem(last=False)
+
+    async def start(self):
+        """Start the background flush loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write all dirty sessions in one batch"""
+        async with self._flush_lock:
+            dirty, self.dirty = self.dirty, set()
+            for user_id in dirty:
+                session = self.user_manager.users.get(user_id)
+                if session is not None:
+                    self.unflushed[user_id] = session.to_bytes()
+            if not self.unflushed:
+                return
+
+            batch = dict(self.unflushed)
+            started = time.monotonic()
+            try:
+                conflicts = await asyncio.to_thread(self.store.save_many, batch)
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ Error writing {len(batch)} sessions, retrying with the next batch: {e}")
+                return
+
+            for user_id, data in batch.items():
+                # A newer version may have been spilled while this batch was written
+                if self.unflushed.get(user_id) is data:
+                    del self.unflushed[user_id]
+                if user_id in conflicts:
+                    continue
+                self._set_base(user_id, data)
+                if user_id not in self.user_manager.users and user_id not in self.unflushed:
+                    self._forget(user_id)
+            if conflicts:
+                self.conflicts += len(conflicts)
+                await self._merge_conflicts({user_id: batch[user_id] for user_id in conflicts})
+            self.batches += 1
+            self.sessions_written += len(batch) - len(conflicts)
+            self.last_flush_ms = (time.monotonic() - started) * 1000
+
+    async def _merge_conflicts(self, written: Dict[int, bytes]):
+        """Reload sessions another instance saved meanwhile and re-apply this instance's changes"""
+        try:
+            remote = await asyncio.to_thread(self.store.load_many, list(written))
+        except Exception as e:
+            self.errors += 1
+            print(f"❌ Error reloading {len(written)} conflicting sessions, retrying with the next batch: {e}")
+            for user_id, data in written.items():
+                if user_id in self.user_manager.users:
+                    self.dirty.add(user_id)
+                else:
+                    self.unflushed.setdefault(user_id, data)
+            return
+
+        for user_id, data in written.items():
+            # Include changes made while the batch was being written
+            session = self.user_manager.users.get(user_id)
+            local = session.to_bytes() if session is not None else self.unflushed.get(user_id, data)
+            remote_data = remote.get(user_id)
+            if remote_data is None:
+                # Expired or deleted meanwhile: write the local session as a new one
+                merged = local
+                self.bases.pop(user_id, None)
+            else:
+                merged = dumps(merge_sessions(loads(local), self.bases.get(user_id), loads(remote_data)))
+                self._set_base(user_id, remote_data)
+            if session is not None:
+                restored = UserSession.from_bytes(merged)
+                restored.last_active = session.last_active
+                self.user_manager.users[user_id] = restored
+                self.dirty.add(user_id)
+            else:
+                self.unflushed[user_id] = merged
+        print(f"⚠️ {len(written)} sessions were changed by another instance, merged this instance's changes into them")
+
+    async def aclose(self):
+        """Stop the flush loop, write what is left and close the store"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self.dirty or self.unflushed:
+            # Sessions merged after a conflict, or a failed batch
+            await self.flush()
+        self.store.close()
+        print(f"💾 Sessions saved ({self.sessions_written} writes in {self.batches} batches)")
+
+    def get_stats(self):
+        """Get write-behind queue depth and batch counters"""
+        return {
+            "dirty": len(self.dirty),
+            "unflushed": len(self.unflushed),
+            "batches": self.batches,
+            "sessions_written": self.sessions_written,
+            "errors": self.errors,
+            "conflicts": self.conflicts,
+            "last_flush_ms": round(self.last_flush_ms, 1),
+            "load_batches": self.load_batches,
+            "sessions_loaded": self.sessions_loaded
+        }
+
+
+def create_session_writer(user_manager: UserManager) -> Optional[SessionWriter]:
+    """Attach write-behind persistence to a UserManager as configured by SESSION_STORE"""
+    if SESSION_STORE in ("", "none"):
+        return None
+    if SESSION_STORE == "sqlite":
+        store = SQLiteSessionStore(SESSION_DB_PATH)
+    elif SESSION_STORE == "redis":
+        from redis_session_store import RedisSessionStore
+        store = RedisSessionStore.from_url(REDIS_URL, SESSION_KEY_PREFIX, SESSION_TTL)
+    else:
+        raise ValueError(f"Unknown SESSION_STORE '{SESSION_STORE}', expected 'sqlite', 'redis' or 'none'")
+    print(f"💾 Persisting sessions to {SESSION_STORE} store")
+    return SessionWriter(store, user_manager, SESSION_FLUSH_INTERVAL, SESSION_FLUSH_BATCH)
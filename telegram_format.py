@@ -0,0 +1,345 @@
+import html
+import re
+from typing import List
+
+# One precompiled pattern for every markdown construct the renderer
+# understands, so the response is scanned exactly once. Alternatives are
+# tried in order: fenced code blocks and inline code first (their content is
+# never parsed), then links, simple emphasis spans, single emphasis markers
+# and runs of blank lines. The pattern runs on already escaped text, which
+# none of these constructs use.
+#
+# Every alternative starts with a literal character so the regex engine can
+# skip plain text quickly; the kind of token is told apart by match.lastgroup
+# (None for a single emphasis marker).
+_TOKEN_RE = re.compile(
+    r"```(?P<lang>[\w+#.-]*)[ \t]*\n?(?P<block>.*?)```"
+    r"|`(?P<code>[^`\n]+)`"
+    r"|\[(?P<link_text>[^\]\n]+)\]\((?P<link>(?:https?|tg)://[^\s()\"]+)\)"
+    # Fast path: emphasis around text without any further markup
+    r"|\*\*(?P<b>[^\s*`\[_](?:[^\n*`\[_]*[^\s*`\[_])?)\*\*"
+    r"|__(?P<u>[^\s*`\[_](?:[^\n*`\[_]*[^\s*`\[_])?)__"
+    r"|\*(?P<i>[^\s*`\[_](?:[^\n*`\[_]*[^\s*`\[_])?)\*"
+    # Anything else is resolved marker by marker
+    r"|\*\*|__|\*"
+    r"|\n(?:[ \t\r\f\v]*\n)+(?P<blank>)",
+    re.S
+)
+
+_MARKER_TAGS = {"**": "b", "*": "i", "__": "u"}
+_MARKER_TAG_NAMES = frozenset(_MARKER_TAGS.values())
+
+
+def escape_html(text: str) -> str:
+    """Escape the characters Telegram's HTML parse mode treats specially"""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def render_telegram_html(text: str) -> str:
+    """
+    Render model markdown as Telegram HTML in a single pass.
+
+    Supports **bold**, *italic*, __underline__, `inline code`, fenced code
+    blocks (with an optional language) and [links](https://...). Emphasis
+    may nest but never spans lines; markers that are not matched, or that
+    would overlap another tag, stay as literal text. The output therefore
+    always has balanced, properly nested tags.
+    """
+    if not text:
+        return text
+
+    text = escape_html(text.strip())
+    parts = []
+    # Open emphasis markers: (marker, text offset, index of its placeholder in parts)
+    open_markers = []
+    position = 0
+
+    for match in _TOKEN_RE.finditer(text):
+        start = match.start()
+        if start > position:
+            parts.append(text[position:start])
+        position = match.end()
+        kind = match.lastgroup
+
+        if kind is None:
+            marker = match.group()
+            if open_markers and text.find("\n", open_markers[0][1], start) != -1:
+                # Emphasis does not continue onto the next line
+                open_markers = [entry for entry in open_markers if text.find("\n", entry[1], start) == -1]
+
+            before = text[start - 1] if start > 0 else " "
+            after = text[position] if position < len(text) else " "
+            open_index = None
+            for i in range(len(open_markers) - 1, -1, -1):
+                if open_markers[i][0] == marker:
+                    open_index = i
+                    break
+
+            if open_index is not None and not before.isspace() and open_markers[open_index][2] < len(parts) - 1:
+                # Markers opened after this one can no longer close, they stay literal
+                del open_markers[open_index + 1:]
+                _, _, placeholder = open_markers.pop()
+                tag = _MARKER_TAGS[marker]
+                parts[placeholder] = f"<{tag}>"
+                parts.append(f"</{tag}>")
+            else:
+                if not after.isspace():
+                    open_markers.append((marker, start, len(parts)))
+                parts.append(marker)
+        elif kind in _MARKER_TAG_NAMES:
+            parts.append(f"<{kind}>{match.group(kind)}</{kind}>")
+        elif kind == "blank":
+            open_markers.clear()
+            parts.append("\n\n")
+        elif kind == "code":
+            parts.append(f"<code>{match.group('code')}</code>")
+        elif kind == "block":
+            open_markers.clear()
+            body = match.group("block").rstrip("\n")
+            lang = match.group("lang")
+            if lang:
+                parts.append(f'<pre><code class="language-{lang}">{body}</code></pre>')
+            else:
+                parts.append(f"<pre>{body}</pre>")
+        elif kind == "link":
+            parts.append(f'<a href="{match.group("link")}">{match.group("link_text")}</a>')
+
+    if position < len(text):
+        parts.append(text[position:])
+
+    return "".join(parts)
+
+
+# Tags (with the attributes they may carry) accepted by Telegram's HTML parse mode
+_ALLOWED_TAGS = {
+    "b": None, "strong": None, "i": None, "em": None, "u": None, "ins": None,
+    "s": None, "strike": None, "del": None, "tg-spoiler": None, "blockquote": None,
+    "a": re.compile(r'\s+href="[^"<>]*"\s*'),
+    "span": re.compile(r'\s+class="tg-spoiler"\s*'),
+    "code": re.compile(r'\s+class="language-[\w+#.-]+"\s*'),
+    "pre": None,
+}
+# Tags whose content Telegram takes literally; only <code> may sit directly inside <pre>
+_LITERAL_TAGS = ("code", "pre")
+
+_MARKUP_RE = re.compile(
+    r"<(?P<close>/?)(?P<tag>[a-zA-Z][\w-]*)(?P<attrs>[^<>]*)>"
+    r"|&(?:#\d+|#x[0-9a-fA-F]+|lt|gt|amp|quot);"
+    r"|[<>&]"
+)
+_STRIP_TAGS_RE = re.compile(r"<[^<>]*>")
+
+
+def _check_tag(match, stack) -> bool:
+    """Check whether a tag is allowed at this point of the document"""
+    tag = match.group("tag").lower()
+    if tag not in _ALLOWED_TAGS:
+        return False
+    if match.group("close"):
+        return bool(match.group("attrs").strip() == "" and stack and stack[-1] == tag)
+
+    attrs = match.group("attrs")
+    pattern = _ALLOWED_TAGS[tag]
+    if attrs.strip():
+        if pattern is None or not pattern.fullmatch(attrs):
+            return False
+    elif tag in ("a", "span"):
+        return False
+    if tag == "code" and attrs.strip() and stack[-1:] != ["pre"]:
+        return False
+    if stack and stack[-1] in _LITERAL_TAGS and not (tag == "code" and stack[-1] == "pre"):
+        return False
+    return True
+
+
+def _scan_html(text: str, repair: bool):
+    """
+    Walk the markup of text, returning (valid, repaired text).
+
+    With repair, tags Telegram would reject and stray <, > and & are escaped
+    and tags left open are closed at the end.
+    """
+    stack = []
+    parts = []
+    position = 0
+    valid = True
+
+    for match in _MARKUP_RE.finditer(text):
+        token = match.group()
+        if match.group("tag") is not None:
+            ok = _check_tag(match, stack)
+            if ok:
+                if match.group("close"):
+                    stack.pop()
+                else:
+                    stack.append(match.group("tag").lower())
+        else:
+            ok = len(token) > 1
+        if ok:
+            continue
+
+        valid = False
+        if not repair:
+            return False, text
+        parts.append(text[position:match.start()])
+        parts.append(escape_html(token))
+        position = match.end()
+
+    if stack:
+        valid = False
+    if valid or not repair:
+        return valid, text
+
+    parts.append(text[position:])
+    parts.extend(f"</{tag}>" for tag in reversed(stack))
+    return False, "".join(parts)
+
+
+def is_valid_telegram_html(text: str) -> bool:
+    """Check text against the tags, attributes and entities Telegram accepts"""
+    return _scan_html(text, repair=False)[0]
+
+
+def html_to_plain_text(text: str) -> str:
+    """Drop all tags and unescape entities, for sending without a parse mode"""
+    return html.unescape(_STRIP_TAGS_RE.sub("", text))
+
+
+class HtmlGuard:
+    """
+    Last check on outgoing HTML before it is sent to Telegram.
+
+    Valid HTML passes through unchanged. Otherwise offending tags are escaped
+    and unclosed tags closed; if that still does not validate, the message is
+    degraded to plain text. Either way the completion is delivered without
+    another round-trip to the model.
+    """
+
+    def __init__(self):
+        self.checked = 0
+        self.repaired = 0
+        self.degraded = 0
+
+    def prepare(self, text: str):
+        """Return (text, is_html) for a message about to be sent"""
+        self.checked += 1
+        valid, repaired = _scan_html(text, repair=True)
+        if valid:
+            return text, True
+        if is_valid_telegram_html(repaired):
+            self.repaired += 1
+            print("🩹 Repaired invalid Telegram HTML before sending")
+            return repaired, True
+        return self.degrade(text), False
+
+    def degrade(self, text: str) -> str:
+        """Fall back to plain text, e.g. after Telegram rejected the HTML"""
+        self.degraded += 1
+        print("⚠️ Sending response as plain text, its HTML was not accepted")
+        return html_to_plain_text(text)
+
+    def get_stats(self):
+        """Get how often outgoing HTML had to be repaired or degraded"""
+        return {
+            "checked": self.checked,
+            "repaired": self.repaired,
+            "degraded": self.degraded
+        }
+
+
+html_guard = HtmlGuard()
+
+
+_OPEN_TAG_RE = re.compile(r"<(/?)([a-zA-Z][\w-]*)[^<>]*>")
+_ANY_TAG_RE = re.compile(r"<[^<>]*>")
+
+
+def _find_break(text: str, budget: int) -> int:
+    """Last paragraph break, line break or space a chunk of at most budget characters can end at"""
+    window = text[:budget]
+    for separator in ("\n\n", "\n", " "):
+        cut = window.rfind(separator)
+        # Only accept breaks in the second half, so chunks stay reasonably full
+        if cut > budget // 2:
+            return cut
+    return budget
+
+
+def _find_cut(text: str, budget: int) -> int:
+    """Best place to end a chunk of at most budget characters of HTML"""
+    window = text[:budget]
+    cut = _find_break(text, budget)
+
+    # Never cut inside a tag or an entity
+    tag_start = window.rfind("<", 0, cut)
+    if tag_start > window.rfind(">", 0, cut):
+        cut = tag_start
+    entity_start = window.rfind("&", 0, cut)
+    if entity_start != -1 and window.find(";", entity_start, cut) == -1 and cut - entity_start < 10:
+        cut = entity_start
+    return cut
+
+
+def _token_end(text: str) -> int:
+    """End of the tag or entity text starts with, so a chunk can take it whole"""
+    closer = {"<": ">", "&": ";"}.get(text[:1])
+    end = text.find(closer) if closer else -1
+    return end + 1 if end != -1 else 1
+
+
+def _open_tags(text: str):
+    """Opening tags still open at the end of a piece of valid HTML"""
+    stack = []
+    for match in _OPEN_TAG_RE.finditer(text):
+        if match.group(1):
+            if stack:
+                stack.pop()
+        else:
+            stack.append((match.group(2), match.group()))
+    return stack
+
+
+def split_telegram_html(text: str, limit: int = 4096, is_html: bool = True) -> List[str]:
+    """
+    Split a reply into messages of at most limit characters.
+
+    Chunks end at a paragraph break, line break or space where possible, and
+    never inside a tag or entity. Tags open at a cut (e.g. a long <pre> block)
+    are closed at the end of the chunk and reopened at the start of the next,
+    so every chunk is valid HTML on its own; when their attributes would
+    leave too little room for text, they are reopened without them.
+    """
+    chunks = []
+    reopen = ""
+    while text and len(reopen) + len(text) > limit:
+        reserve = 0
+        while True:
+            budget = max(limit - len(reopen) - reserve, 1)
+            cut = _find_cut(text, budget) if is_html else _find_break(text, budget)
+            if cut <= 0:
+                # A tag or entity straddles the budget: take it whole rather than split it
+                cut = _token_end(text)
+            head = text[:cut]
+            open_tags = _open_tags(reopen + head) if is_html else []
+            close = "".join(f"</{name}>" for name, _ in reversed(open_tags))
+            # A larger reserve only helps if the closing tags outgrew it
+            if len(reopen) + len(head) + len(close) <= limit or reserve >= min(len(close), limit // 2):
+                break
+            reserve = len(close)
+
+        if open_tags:
+            chunks.append(reopen + head + close)
+            # The line break at the cut is implied by the message boundary
+            text = text[cut + 1:] if text[cut:cut + 1] == "\n" else text[cut:]
+        else:
+            chunks.append((reopen + head).rstrip())
+            text = text[cut:].lstrip()
+        reopen = "".join(tag for _, tag in open_tags)
+        if len(reopen) + len(close) > limit // 2:
+            # Keep room for the text: reopen the tags without their attributes
+            reopen = "".join(f"<{name}>" for name, _ in open_tags)
+
+    if text:
+        chunks.append(reopen + text)
+    # Chunks of tags only (e.g. a cut right after an opening tag) show nothing
+    return [chunk for chunk in chunks if _ANY_TAG_RE.sub("", chunk).strip()]
@@ -0,0 +1,204 @@
+import secrets
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Message, Update
+from telegram.constants import ParseMode, MessageLimit
+from telegram.error import BadRequest, RetryAfter, TelegramError
+from telegram.ext import ContextTypes
+from config import STREAM_EDIT_INTERVAL, LONG_REPLY_SHOW_MORE, CONTINUATION_STORE_SIZE, CONTINUATION_TTL
+from telegram_format import html_guard, split_telegram_html
+
+MORE_CALLBACK_PREFIX = "more_"
+MORE_CALLBACK_PATTERN = f"^{MORE_CALLBACK_PREFIX}"
+
+
+class ContinuationStore:
+    """
+    Bounded store for the unsent chunks of long replies, shown one at a
+    time behind a "Show more" button.
+
+    Entries expire after ttl seconds; beyond max_entries the least recently
+    used entry is dropped.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stored = 0
+        self.shown = 0
+        self.expired = 0
+
+    def put(self, chunks: List[str], is_html: bool) -> str:
+        """Store chunks and return the key for the button"""
+        key = secrets.token_urlsafe(8)
+        self.entries[key] = (list(chunks), is_html, time.monotonic() + self.ttl)
+        self.stored += 1
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.expired += 1
+        return key
+
+    def pop(self, key: str) -> Optional[Tuple[str, bool, int]]:
+        """Take the next chunk as (chunk, is_html, chunks left), or None if gone"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        chunks, is_html, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self.entries[key]
+            self.expired += 1
+            return None
+
+        chunk = chunks.pop(0)
+        if chunks:
+            self.entries.move_to_end(key)
+        else:
+            del self.entries[key]
+        self.shown += 1
+        return chunk, is_html, len(chunks)
+
+    def get_stats(self):
+        """Get stored, shown and expired continuation counters"""
+        return {
+            "pending": len(self.entries),
+            "stored": self.stored,
+            "shown": self.shown,
+            "expired": self.expired
+        }
+
+
+continuation_store = ContinuationStore(CONTINUATION_STORE_SIZE, CONTINUATION_TTL)
+
+
+def _is_parse_error(error: BadRequest) -> bool:
+    return "can't parse entities" in str(error).lower()
+
+
+def _more_button(key: str, remaining: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([[
+        InlineKeyboardButton(f"⬇️ Show more ({remaining} left)", callback_data=f"{MORE_CALLBACK_PREFIX}{key}")
+    ]])
+
+
+async def _send_chunk(send, chunk: str, is_html: bool, **kwargs) -> Message:
+    """Send one chunk with send (reply_text or edit_text), degrading to plain text if Telegram rejects the HTML"""
+    try:
+        return await send(chunk, parse_mode=ParseMode.HTML if is_html else None, **kwargs)
+    except BadRequest as e:
+        if not is_html or not _is_parse_error(e):
+            raise
+        return await send(html_guard.degrade(chunk), **kwargs)
+
+
+async def _deliver(send_first, message: Message, formatted_text: str) -> Message:
+    """
+    Send a formatted reply, checked by html_guard and split at Telegram's
+    length limit. The first chunk goes out through send_first right away; the
+    rest follow as separate messages or wait behind a "Show more" button.
+    """
+    text, is_html = html_guard.prepare(formatted_text)
+    chunks = split_telegram_html(text, MessageLimit.MAX_TEXT_LENGTH, is_html)
+    if len(chunks) <= 1:
+        return await _send_chunk(send_first, chunks[0] if chunks else text, is_html)
+
+    if LONG_REPLY_SHOW_MORE:
+        key = continuation_store.put(chunks[1:], is_html)
+        return await _send_chunk(send_first, chunks[0], is_html, reply_markup=_more_button(key, len(chunks) - 1))
+
+    sent = await _send_chunk(send_first, chunks[0], is_html)
+    for chunk in chunks[1:]:
+        await _send_chunk(message.reply_text, chunk, is_html)
+    return sent
+
+
+async def reply_html(message: Message, formatted_text: str) -> Message:
+    """Reply with a formatted response, repaired if needed and split if too long"""
+    return await _deliver(message.reply_text, message, formatted_text)
+
+
+async def show_more(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle a "Show more" button press by sending the next chunk of the reply"""
+    query = update.callback_query
+    await query.answer()
+    try:
+        # The button moves to the newly sent chunk
+        await query.edit_message_reply_markup(None)
+    except BadRequest:
+        pass
+
+    key = query.data[len(MORE_CALLBACK_PREFIX):]
+    entry = continuation_store.pop(key)
+    if entry is None:
+        await query.message.reply_text("⌛ The rest of this reply has expired. Please ask again.")
+        return
+    chunk, is_html, remaining = entry
+    markup = _more_button(key, remaining) if remaining else None
+    await _send_chunk(query.message.reply_text, chunk, is_html, reply_markup=markup)
+
+
+class StreamingReply:
+    """
+    A reply message that is progressively edited while a response streams in.
+
+    Edits are coalesced so a message is edited at most once per
+    STREAM_EDIT_INTERVAL seconds, keeping under Telegram's edit rate limits.
+    Intermediate edits are sent as plain text because partial markdown is not
+    valid HTML; the final edit carries the formatted HTML response.
+    """
+
+    def __init__(self, message: Message, edit_interval: float = STREAM_EDIT_INTERVAL):
+        self.message = message
+        self.edit_interval = edit_interval
+        self.reply = None
+        self._last_edit = 0.0
+        self._shown_text = ""
+
+    async def start(self, placeholder: str = "💭 …"):
+        """Send the placeholder message that will be edited"""
+        self.reply = await self.message.reply_text(placeholder)
+        self._last_edit = time.monotonic()
+
+    async def update(self, text: str):
+        """Show the text received so far, unless the last edit was too recent"""
+        if self.reply is None or not text.strip():
+            return
+        if time.monotonic() - self._last_edit < self.edit_interval:
+            return
+
+        text = text[:MessageLimit.MAX_TEXT_LENGTH]
+        if text == self._shown_text:
+            return
+
+        self._last_edit = time.monotonic()
+        try:
+            await self.reply.edit_text(text)
+            self._shown_text = text
+        except RetryAfter as e:
+            # Back off until Telegram allows edits again
+            self._last_edit = time.monotonic() + e.retry_after
+        except TelegramError as e:
+            # Intermediate edits are best-effort; the final edit shows everything
+            print(f"⚠️ Streaming edit skipped: {e}")
+
+    async def finish(self, formatted_text: str):
+        """Replace the streamed text with the final formatted response"""
+        if self.reply is None:
+            self.reply = await reply_html(self.message, formatted_text)
+            return
+        try:
+            await _deliver(self.reply.edit_text, self.message, formatted_text)
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                raise
+
+    async def fail(self, text: str):
+        """Replace the placeholder or the partial response with an error message"""
+        if self.reply is not None:
+            try:
+                await self.reply.edit_text(text)
+                return
+            except BadRequest as e:
+                print(f"⚠️ Could not show the error in the streamed reply: {e}")
+        await self.message.reply_text(text)
@@ -0,0 +1,162 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+from redis_session_store import RedisSessionStore, FakeRedis
+from session_store import SessionWriter
+from user_manager import UserManager
+
+
+class CountingRedis(FakeRedis):
+    """FakeRedis that counts pipeline round-trips"""
+
+    def __init__(self):
+        super().__init__()
+        self.round_trips = 0
+
+    def pipeline(self, transaction=True):
+        pipe = super().pipeline(transaction)
+        execute = pipe.execute
+
+        def counted_execute():
+            self.round_trips += 1
+            return execute()
+        pipe.execute = counted_execute
+        return pipe
+
+
+def history(user_manager, user_id):
+    return [message.content for message in user_manager.users[user_id].history or ()]
+
+
+class RedisSessionStoreTest(unittest.TestCase):
+    def test_batch_is_one_pipeline(self):
+        redis = CountingRedis()
+        store = RedisSessionStore(redis, "test:", 60)
+        records = {user_id: f"session {user_id}".encode() for user_id in range(50)}
+
+        self.assertEqual(store.save_many(records), set())
+        self.assertEqual(redis.round_trips, 1)
+        self.assertEqual(store.load_many(list(range(60))), records)
+        self.assertEqual(redis.round_trips, 2)
+        self.assertEqual(store.versions[7], 1)
+
+    def test_stale_version_conflicts(self):
+        redis = FakeRedis()
+        first, second = RedisSessionStore(redis, "test:", 60), RedisSessionStore(redis, "test:", 60)
+        first.save_many({1: b"a"})
+        second.load(1)
+        second.save_many({1: b"b"})
+
+        self.assertEqual(first.save_many({1: b"c", 2: b"d"}), {1})
+        self.assertEqual(first.load(1), b"b")
+        self.assertEqual(first.load(2), b"d")
+
+    def test_sessions_expire_after_ttl(self):
+        store = RedisSessionStore(FakeRedis(), "test:", 0.05)
+        store.save_many({1: b"a"})
+        self.assertEqual(store.load(1), b"a")
+        time.sleep(0.1)
+        self.assertIsNone(store.load(1))
+        self.assertNotIn(1, store.versions)
+
+
+class SessionWriterOnRedisTest(unittest.IsolatedAsyncioTestCase):
+    def make_instance(self, redis, ttl=60):
+        user_manager = UserManager()
+        writer = SessionWriter(RedisSessionStore(redis, "test:", ttl), user_manager, 60, 100)
+        return user_manager, writer
+
+    async def test_conflict_merges_local_changes(self):
+        redis = FakeRedis()
+        users_a, writer_a = self.make_instance(redis)
+        users_b, writer_b = self.make_instance(redis)
+        users_a.add_message(1, "user", "hello")
+        await writer_a.flush()
+
+        await users_b.prefetch(1)
+        users_b.add_message(1, "user", "from b")
+        users_b.set_partner_name(1, "Sam")
+        await writer_b.flush()
+
+        users_a.add_message(1, "assistant", "from a")
+        users_a.set_user_role(1, "coder")
+        await writer_a.flush()
+        self.assertEqual(writer_a.conflicts, 1)
+        self.assertEqual(history(users_a, 1), ["hello", "from b", "from a"])
+        self.assertEqual(users_a.users[1].partner_name, "Sam")
+        self.assertEqual(users_a.users[1].role, "coder")
+
+        # The merged session is written with the next batch
+        await writer_a.flush()
+        users_c, _ = self.make_instance(redis)
+        await users_c.prefetch(1)
+        self.assertEqual(history(users_c, 1), ["hello", "from b", "from a"])
+        self.assertEqual(users_c.users[1].role, "coder")
+
+    async def test_conflict_keeps_local_clear(self):
+        redis = FakeRedis()
+        users_a, writer_a = self.make_instance(redis)
+        users_b, writer_b = self.make_instance(redis)
+        users_a.add_message(1, "user", "hello")
+        await writer_a.flush()
+
+        await users_b.prefetch(1)
+        users_b.add_message(1, "user", "from b")
+        await writer_b.flush()
+
+        users_a.clear_conversation(1)
+        await writer_a.flush()
+        self.assertEqual(history(users_a, 1), [])
+
+    async def test_expired_session_is_written_again(self):
+        redis = FakeRedis()
+        user_manager, writer = self.make_instance(redis, ttl=0.05)
+        user_manager.add_message(1, "user", "hello")
+        await writer.flush()
+        await asyncio.sleep(0.1)
+
+        user_manager.add_message(1, "user", "still here")
+        await writer.flush()
+        self.assertEqual(writer.conflicts, 1)
+        await writer.flush()
+
+        users_b, _ = self.make_instance(redis)
+        await users_b.prefetch(1)
+        self.assertEqual(history(users_b, 1), ["hello", "still here"])
+
+    async def test_evicted_clean_sessions_are_forgotten(self):
+        redis = FakeRedis()
+        user_manager, writer = self.make_instance(redis)
+        user_manager.max_sessions = 5
+        for user_id in range(20):
+            user_manager.add_message(user_id, "user", f"hello {user_id}")
+            await writer.flush()
+
+        self.assertEqual(len(user_manager.users), 5)
+        self.assertEqual(set(writer.bases), set(user_manager.users))
+        self.assertEqual(set(writer.store.versions), set(user_manager.users))
+        await user_manager.prefetch(3)
+        self.assertEqual(history(user_manager, 3), ["hello 3"])
+
+    async def test_restores_are_batched_into_one_pipeline(self):
+        redis = CountingRedis()
+        user_manager, writer = self.make_instance(redis)
+        for user_id in range(20):
+            user_manager.add_message(user_id, "user", f"hello {user_id}")
+        await writer.flush()
+
+        restarted, restarted_writer = self.make_instance(redis)
+        round_trips = redis.round_trips
+        await asyncio.gather(*(restarted.prefetch(user_id) for user_id in range(25)))
+        self.assertEqual(redis.round_trips - round_trips, 1)
+        self.assertEqual(restarted_writer.get_stats()["sessions_loaded"], 20)
+        self.assertEqual(history(restarted, 3), ["hello 3"])
+        # Users without a stored session are not looked up again
+        self.assertIn(22, restarted_writer.absent)
+        with mock.patch.object(restarted_writer.store, "load", side_effect=AssertionError("store was read")):
+            restarted.get_user_role(22)
+
+
+if __name__ == "__main__":
+    unittest.main()
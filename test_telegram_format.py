@@ -0,0 +1,55 @@
+import html
+import re
+import unittest
+from telegram_format import split_telegram_html
+
+PARTIAL_TAG = re.compile(r"<[^>]*$")
+PARTIAL_ENTITY = re.compile(r"&[a-z#0-9]*(<|$)")
+
+
+def visible_text(chunks):
+    """Text a reader sees across all chunks, ignoring whitespace at the cuts"""
+    text = html.unescape(re.sub(r"<[^>]*>", "", "".join(chunks)))
+    return re.sub(r"\s", "", text)
+
+
+class SplitTelegramHtmlTest(unittest.TestCase):
+    def assert_valid_split(self, text, limit, max_length=None):
+        chunks = split_telegram_html(text, limit)
+        for chunk in chunks:
+            self.assertIsNone(PARTIAL_TAG.search(chunk), chunk)
+            self.assertIsNone(PARTIAL_ENTITY.search(chunk), chunk)
+            self.assertLessEqual(len(chunk), max_length or limit, chunk)
+        self.assertEqual(visible_text(chunks), visible_text([text]))
+        return chunks
+
+    def test_long_reopened_tag_is_reopened_without_attributes(self):
+        text = '<pre><code class="language-python">' + "x" * 30 + "</code></pre>"
+        chunks = self.assert_valid_split(text, 40)
+        self.assertTrue(all(chunk.startswith("<pre><code>") for chunk in chunks))
+
+    def test_entities_at_the_boundary_are_kept_whole(self):
+        text = '<pre><code class="language-wordword">' + "&amp;" * 30 + "</code></pre>"
+        self.assert_valid_split(text, 50)
+        for limit in range(30, 60):
+            self.assert_valid_split("<b>" + "a&lt;b " * 40 + "</b>", limit)
+
+    def test_small_limits_terminate(self):
+        text = '<pre><code class="language-wordword">' + "&amp;x &lt;y&gt; " * 5 + "</code></pre>"
+        for limit in range(5, 60):
+            # Below a tag's length a chunk may exceed the limit, but never splits it
+            self.assert_valid_split(text, limit, max_length=max(limit, 70))
+
+    def test_tags_are_closed_and_reopened(self):
+        chunks = self.assert_valid_split("<b>" + "word " * 40 + "</b>", 50)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(chunk.startswith("<b>") and chunk.endswith("</b>") for chunk in chunks))
+
+    def test_plain_text_falls_back_to_spaces(self):
+        chunks = split_telegram_html("word " * 100, 50, is_html=False)
+        self.assertEqual(" ".join(chunks).split(), ["word"] * 100)
+        self.assertTrue(all(len(chunk) <= 50 for chunk in chunks))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+from unittest import mock
+from telegram.error import TimedOut
+from cerebras_client import AsyncCerebrasClient
+from telegram_format import render_telegram_html
+from telegram_stream import StreamingReply
+
+DELTAS = ["The answer ", "comes in ", "several ", "parts."]
+
+
+class FakeReply:
+    """Sent message whose edits are recorded; the edit number fail_on raises TimedOut"""
+
+    def __init__(self, fail_on: int):
+        self.fail_on = fail_on
+        self.edits = []
+
+    async def edit_text(self, text, **kwargs):
+        self.edits.append(text)
+        if len(self.edits) == self.fail_on:
+            raise TimedOut()
+        return self
+
+
+class FakeMessage:
+    def __init__(self, reply: FakeReply):
+        self.reply = reply
+
+    async def reply_text(self, text, **kwargs):
+        return self.reply
+
+
+async def fake_stream():
+    for delta in DELTAS:
+        yield delta
+
+
+class StreamingReplyTest(unittest.IsolatedAsyncioTestCase):
+    async def test_failed_edit_does_not_cut_the_answer(self):
+        client = AsyncCerebrasClient()
+        client.response_cache = None
+        reply = FakeReply(fail_on=2)
+        streaming_reply = StreamingReply(FakeMessage(reply), edit_interval=0)
+        await streaming_reply.start()
+
+        with mock.patch.object(client, "_open_stream", side_effect=lambda *args: fake_stream()):
+            response = await client.stream_response(
+                [{"role": "user", "content": "question"}], "system", streaming_reply.update, use_cache=False, user_id=1
+            )
+        await streaming_reply.finish(render_telegram_html(response))
+
+        self.assertEqual(response, "".join(DELTAS))
+        self.assertEqual(len(reply.edits), len(DELTAS) + 1)
+        self.assertEqual(reply.edits[-1], "".join(DELTAS))
+
+    async def test_update_skips_telegram_errors(self):
+        reply = FakeReply(fail_on=1)
+        streaming_reply = StreamingReply(FakeMessage(reply), edit_interval=0)
+        await streaming_reply.start()
+        await streaming_reply.update("partial")
+        await streaming_reply.update("partial answer")
+        self.assertEqual(reply.edits, ["partial", "partial answer"])
+
+
+if __name__ == "__main__":
+    unittest.main()
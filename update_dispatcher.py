@@ -0,0 +1,271 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from hedging import LatencyTracker
+from telegram_stream import MORE_CALLBACK_PREFIX
+
+COMMAND_LANE = "commands"  # Commands and button presses
+DEFAULT_LANE = "updates"  # Updates that are neither commands nor text messages
+# Commands that only show information and change no user state; the only ones that skip the user's queue
+READ_ONLY_COMMANDS = frozenset({"help", "status", "ping", "roles", "models", "currentmodel", "debug"})
+
+
+class _UserQueue:
+    """Read-only or other updates of one user: a lock that runs them one at a time, in arrival order"""
+
+    __slots__ = ("lock", "pending")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class _Lane:
+    """A bulkhead: updates of one kind, with their own concurrency limit and latency metrics"""
+
+    __slots__ = ("slots", "limit", "priority", "running", "waiting", "processed", "waits", "latencies")
+
+    def __init__(self, limit: int, priority: bool):
+        self.slots = asyncio.Semaphore(limit)
+        self.limit = limit
+        self.priority = priority
+        self.running = 0
+        self.waiting = 0
+        self.processed = 0
+        self.waits = LatencyTracker(window=500)
+        self.latencies = LatencyTracker(window=500)
+
+    def get_stats(self):
+        return {
+            "limit": self.limit,
+            "running": self.running,
+            "queue_depth": self.waiting,
+            "processed": self.processed,
+            "p50_wait_ms": round((self.waits.percentile(50) or 0.0) * 1000, 1),
+            "p50_ms": round((self.latencies.percentile(50) or 0.0) * 1000, 1),
+            "p95_ms": round((self.latencies.percentile(95) or 0.0) * 1000, 1)
+        }
+
+
+class UserOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Concurrent update processing that keeps each user's updates in order.
+
+    Updates of different users run concurrently, at most max_concurrent
+    at a time. Updates of the same user wait on that user's lock, which is
+    taken before a concurrency slot, so they never hold max_concurrent
+    slots other users could use. A user's queue is dropped as soon as its
+    last update finishes, so idle users cost nothing. Updates without a
+    user or chat run unordered.
+
+    At most max_pending updates are admitted at once (PTB queues the
+    rest), and an update waiting on its user's lock still holds one of
+    those admission slots. So that one user flooding the bot cannot take
+    them all, updates beyond max_user_pending queued for the same user
+    are dropped.
+
+    lane_of sorts updates into lanes (bulkheads), each with its own limit
+    from lane_limits (default_lane_limit for lanes not listed), so one
+    kind of slow update cannot take every slot. Priority lanes also skip
+    the max_concurrent limit. lane_of is asked in the user's turn, so it
+    may read user state that earlier updates change; prefetch, if given, is
+    awaited with the user's id just before, e.g. to load their session
+    without blocking the event loop.
+
+    Updates read_only accepts change no user state (e.g. /help, /status),
+    so they are ordered per user separately from everything else and never
+    wait behind the same user's slow replies. Only these informational
+    updates skip the user's queue: state-changing commands like /start,
+    /clear or a role choice keep their place in it, so they wait until the
+    user's in-flight reply is done and then apply on top of it.
+    """
+
+    def __init__(self, max_concurrent: int, max_pending: int,
+                 lane_of: Optional[Callable[[object], str]] = None,
+                 lane_limits: Optional[Dict[str, int]] = None,
+                 default_lane_limit: Optional[int] = None,
+                 priority_lanes: Iterable[str] = (),
+                 read_only: Optional[Callable[[object], bool]] = None,
+                 prefetch: Optional[Callable[[int], Awaitable[None]]] = None,
+                 max_user_pending: Optional[int] = None):
+        super().__init__(max(max_pending, max_concurrent, 2))
+        self.max_concurrent = max_concurrent
+        self.max_user_pending = max_user_pending
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.lane_of = lane_of or (lambda update: DEFAULT_LANE)
+        self.lane_limits = lane_limits or {}
+        self.default_lane_limit = default_lane_limit or max_concurrent
+        self.priority_lanes = set(priority_lanes)
+        self.read_only = read_only or (lambda update: False)
+        self.prefetch = prefetch
+        self.lanes: Dict[str, _Lane] = {}
+        self.user_queues: Dict[Tuple[int, bool], _UserQueue] = {}
+        self.running = 0
+        self.waiting = 0
+        self.processed = 0
+        self.dropped = 0
+        self.peak_waiting = 0
+        self.peak_user_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        # How long the first update waited (e.g. for its session) before it started
+        self.first_update_wait: Optional[float] = None
+
+    @staticmethod
+    def _key(update: object) -> Optional[int]:
+        """Order updates per user, or per chat for updates without a user"""
+        if isinstance(update, Update):
+            if update.effective_user is not None:
+                return update.effective_user.id
+            if update.effective_chat is not None:
+                return update.effective_chat.id
+        return None
+
+    def _get_lane(self, name: str) -> _Lane:
+        lane = self.lanes.get(name)
+        if lane is None:
+            lane = self.lanes[name] = _Lane(
+                self.lane_limits.get(name, self.default_lane_limit), name in self.priority_lanes
+            )
+        return lane
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self._key(update)
+        queue = None
+        if key is not None:
+            queue_key = (key, self.read_only(update))
+            queue = self.user_queues.get(queue_key)
+            if queue is None:
+                queue = self.user_queues[queue_key] = _UserQueue()
+            if self.max_user_pending is not None and queue.pending >= self.max_user_pending:
+                self.dropped += 1
+                if hasattr(coroutine, "close"):
+                    coroutine.close()
+                print(f"⚠️ Dropped an update of {key}: {queue.pending} already queued")
+                return
+            queue.pending += 1
+            self.peak_user_depth = max(self.peak_user_depth, queue.pending)
+
+        queued_at = time.monotonic()
+        lane = None
+        started = False
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        try:
+            if queue is not None:
+                await queue.lock.acquire()
+            try:
+                await self._prefetch(update)
+                lane = self._get_lane(self.lane_of(update))
+                lane.waiting += 1
+                async with lane.slots:
+                    if lane.priority:
+                        started = self._start(lane, queued_at)
+                        await coroutine
+                    else:
+                        async with self._slots:
+                            started = self._start(lane, queued_at)
+                            await coroutine
+            finally:
+                if queue is not None:
+                    queue.lock.release()
+        finally:
+            if started:
+                self._finish(lane, queued_at)
+            else:
+                # Cancelled while still queued
+                self.waiting -= 1
+                if lane is not None:
+                    lane.waiting -= 1
+            if queue is not None:
+                queue.pending -= 1
+                if queue.pending == 0 and self.user_queues.get(queue_key) is queue:
+                    del self.user_queues[queue_key]
+
+    async def _prefetch(self, update: object):
+        if self.prefetch is None or not isinstance(update, Update) or update.effective_user is None:
+            return
+        try:
+            await self.prefetch(update.effective_user.id)
+        except Exception as e:
+            # The handler reads the session the blocking way instead
+            print(f"⚠️ Prefetch for user {update.effective_user.id} failed: {e}")
+
+    def _start(self, lane: _Lane, queued_at: float) -> bool:
+        wait = time.monotonic() - queued_at
+        self.waiting -= 1
+        lane.waiting -= 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        lane.waits.record(wait)
+        if self.first_update_wait is None:
+            self.first_update_wait = wait
+        self.running += 1
+        lane.running += 1
+        return True
+
+    def _finish(self, lane: _Lane, queued_at: float):
+        self.running -= 1
+        lane.running -= 1
+        self.processed += 1
+        lane.processed += 1
+        lane.latencies.record(time.monotonic() - queued_at)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def get_stats(self):
+        """Get queue depth, per-user queue and queue-wait metrics"""
+        return {
+            "running": self.running,
+            "queue_depth": self.waiting,
+            "users": len(self.user_queues),
+            "max_user_depth": max((queue.pending for queue in self.user_queues.values()), default=0),
+            "peak_queue_depth": self.peak_waiting,
+            "peak_user_depth": self.peak_user_depth,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "avg_wait_ms": round(self.total_wait / self.processed * 1000, 1) if self.processed else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+            "first_update_wait_ms": round(self.first_update_wait * 1000, 1) if self.first_update_wait is not None else None
+        }
+
+    def get_lane_stats(self):
+        """Get limit, queue depth and wait/latency percentiles (queued to done) of every lane used so far"""
+        return {name: lane.get_stats() for name, lane in self.lanes.items()}
+
+
+def lane_by_role(user_manager) -> Callable[[object], str]:
+    """
+    Lane of an update: commands and button presses go to COMMAND_LANE,
+    text messages to the lane named after the user's current role
+    """
+    def lane_of(update: object) -> str:
+        if isinstance(update, Update):
+            if update.callback_query is not None:
+                return COMMAND_LANE
+            message = update.message
+            if message is not None and message.text is not None:
+                if message.text.startswith("/"):
+                    return COMMAND_LANE
+                if update.effective_user is not None:
+                    return user_manager.get_user_role(update.effective_user.id)
+        return DEFAULT_LANE
+    return lane_of
+
+
+def read_only_update(update: object) -> bool:
+    """Whether an update only reads user state: an informational command or a "Show more" press"""
+    if isinstance(update, Update):
+        if update.callback_query is not None:
+            return (update.callback_query.data or "").startswith(MORE_CALLBACK_PREFIX)
+        message = update.message
+        if message is not None and message.text is not None and message.text.startswith("/"):
+            command = (message.text[1:].split() or [""])[0]
+            return command.split("@", 1)[0].lower() in READ_ONLY_COMMANDS
+    return False
@@ -1,91 +1,279 @@
-from typing import Dict, List, Optional
-from config import ROLES, DEFAULT_ROLE
-
-class UserManager:
-    def __init__(self):
-        self.users: Dict[int, Dict] = {}
-    
-    def get_user(self, user_id: int) -> Dict:
-        """Get or create a user session"""
-        if user_id not in self.users:
-            self.users[user_id] = {
-                "role": DEFAULT_ROLE,
-                "conversation": [],
-                "name": None,
-                "partner_name": None  # Store partner name for partner roles
-            }
-        return self.users[user_id]
-    
-    def set_user_role(self, user_id: int, role: str) -> bool:
-        """Set user's selected role"""
-        try:
-            if role in ROLES:
-                user = self.get_user(user_id)
-                user["role"] = role
-                print(f"✅ User {user_id} role changed to: {role}")
-                return True
-            else:
-                print(f"❌ Invalid role '{role}' for user {user_id}")
-                return False
-        except Exception as e:
-            print(f"❌ Error setting role for user {user_id}: {e}")
-            return False
-    
-    def get_user_role(self, user_id: int) -> str:
-        """Get user's current role"""
-        user = self.get_user(user_id)
-        return user["role"]
-    
-    def add_message(self, user_id: int, role: str, content: str):
-        """Add a message to user's conversation history"""
-        user = self.get_user(user_id)
-        user["conversation"].append({
-            "role": role,
-            "content": content,
-            "timestamp": None  # Could add timestamp if needed
-        })
-        
-        # Keep only last 20 messages to prevent memory issues
-        if len(user["conversation"]) > 20:
-            user["conversation"] = user["conversation"][-20:]
-    
-    def get_conversation(self, user_id: int) -> List[Dict]:
-        """Get user's conversation history"""
-        user = self.get_user(user_id)
-        return user["conversation"]
-    
-    def clear_conversation(self, user_id: int):
-        """Clear user's conversation history"""
-        user = self.get_user(user_id)
-        user["conversation"] = []
-    
-    def set_user_name(self, user_id: int, name: str):
-        """Set user's name"""
-        user = self.get_user(user_id)
-        user["name"] = name
-    
-    def get_user_name(self, user_id: int) -> Optional[str]:
-        """Get user's name"""
-        user = self.get_user(user_id)
-        return user["name"]
-    
-    def set_partner_name(self, user_id: int, partner_name: str):
-        """Set partner name for partner roles"""
-        user = self.get_user(user_id)
-        user["partner_name"] = partner_name
-        print(f"✅ User {user_id} partner name set to: {partner_name}")
-    
-    def get_partner_name(self, user_id: int) -> Optional[str]:
-        """Get partner name for partner roles"""
-        user = self.get_user(user_id)
-        return user.get("partner_name")
-    
-    def clear_partner_name(self, user_id: int):
-        """Clear partner name when switching away from partner roles"""
-        user = self.get_user(user_id)
-        user["partner_name"] = None
-        print(f"✅ User {user_id} partner name cleared")
-    
-    def get_available_roles(self) -> Dict[str, Dict]:
-        """Get all available roles"""
+import time
+from collections import OrderedDict, deque
+from enum import Enum
+from typing import Awaitable, Callable, Dict, List, Optional
+from config import ROLES, DEFAULT_ROLE, MAX_HISTORY_MESSAGES, SESSION_IDLE_TTL, SESSION_MAX_COUNT
+from context_builder import estimate_message_tokens
+from payload_codec import dumps, encode_message, loads
+
+
+class MessageRole(Enum):
+    """Author of a conversation message"""
+    USER = "user"
+    ASSISTANT = "assistant"
+
+
+class ChatMessage:
+    """
+    One conversation message. Also readable like the message dicts used
+    before ({"role", "content"}), so callers can keep using msg["content"].
+    """
+
+    __slots__ = ("role", "content", "encoded", "tokens")
+
+    def __init__(self, role: MessageRole, content: str):
+        self.role = role
+        self.content = content
+        # Encoded once here instead of on every request that includes it
+        self.encoded = encode_message(role.value, content)
+        self.tokens = estimate_message_tokens({"content": content})
+
+    def __getitem__(self, key: str):
+        if key == "role":
+            return self.role.value
+        if key in self.__slots__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        return self[key] if key in self.__slots__ else default
+
+
+class UserSession:
+    """
+    Per-user state. The history is a ring buffer of the newest messages,
+    created with the first message so sessions without any stay small.
+    """
+
+    __slots__ = ("role", "history", "name", "partner_name", "summary", "last_active")
+
+    def __init__(self, role: str = DEFAULT_ROLE):
+        self.role = role
+        self.history: Optional[deque] = None
+        self.name = None
+        self.partner_name = None  # Store partner name for partner roles
+        self.summary = None  # Rolling summary of turns folded out of the conversation
+        self.last_active = time.monotonic()
+
+    def to_bytes(self) -> bytes:
+        """Serialize the session for a persistent store"""
+        return dumps({
+            "role": self.role,
+            "name": self.name,
+            "partner_name": self.partner_name,
+            "summary": self.summary,
+            "history": [[message.role.value, message.content] for message in self.history or ()]
+        })
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "UserSession":
+        """Rebuild a session serialized with to_bytes"""
+        fields = loads(data)
+        session = cls(fields["role"])
+        session.name = fields["name"]
+        session.partner_name = fields["partner_name"]
+        session.summary = fields["summary"]
+        if fields["history"]:
+            session.history = deque(
+                (ChatMessage(MessageRole(role), content) for role, content in fields["history"]),
+                maxlen=MAX_HISTORY_MESSAGES
+            )
+        return session
+
+
+class UserManager:
+    """
+    In-memory user sessions, kept in least-recently-active order.
+
+    Sessions idle for more than idle_ttl seconds, and the least recently
+    active ones beyond max_sessions, are evicted when new sessions are
+    created. An optional spill hook receives each evicted session (e.g. to
+    save it to a persistent store) and a restore hook is asked for sessions
+    that are not in memory, so evicted users can come back where they left.
+    restore_async is its non-blocking counterpart, used by prefetch() to
+    bring a session into memory before an update reads it.
+    on_change is called with the user id after every change to a session.
+    """
+    
+    def __init__(self, idle_ttl: float = SESSION_IDLE_TTL, max_sessions: int = SESSION_MAX_COUNT,
+                 spill: Optional[Callable[[int, UserSession], None]] = None,
+                 restore: Optional[Callable[[int], Optional[UserSession]]] = None,
+                 on_change: Optional[Callable[[int], None]] = None,
+                 restore_async: Optional[Callable[[int], Awaitable[Optional[UserSession]]]] = None):
+        self.users: "OrderedDict[int, UserSession]" = OrderedDict()
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.spill = spill
+        self.restore = restore
+        self.restore_async = restore_async
+        self.on_change = on_change
+        self.evicted_idle = 0
+        self.evicted_capacity = 0
+        self.spilled = 0
+        self.restored = 0
+    
+    def _changed(self, user_id: int):
+        if self.on_change is not None:
+            self.on_change(user_id)
+    
+    def _find_user(self, user_id: int) -> Optional[UserSession]:
+        """Get an existing session, restoring a spilled one, and mark it as active"""
+        user = self.users.get(user_id)
+        if user is None and self.restore is not None:
+            user = self.restore(user_id)
+            if user is not None:
+                self._evict()
+                self.users[user_id] = user
+                self.restored += 1
+        if user is not None:
+            user.last_active = time.monotonic()
+            self.users.move_to_end(user_id)
+        return user
+    
+    async def prefetch(self, user_id: int):
+        """Restore a session that is not in memory without blocking the event loop"""
+        if user_id in self.users or self.restore_async is None:
+            return
+        user = await self.restore_async(user_id)
+        # Another update of the user may have restored or created it meanwhile
+        if user is not None and user_id not in self.users:
+            self._evict()
+            self.users[user_id] = user
+            self.restored += 1
+    
+    def _evict(self):
+        """Make room for one new session by evicting idle and least recently active sessions"""
+        now = time.monotonic()
+        while self.users:
+            user_id, user = next(iter(self.users.items()))
+            if now - user.last_active > self.idle_ttl:
+                self.evicted_idle += 1
+            elif len(self.users) >= self.max_sessions:
+                self.evicted_capacity += 1
+            else:
+                break
+            del self.users[user_id]
+            if self.spill is not None:
+                try:
+                    self.spill(user_id, user)
+                    self.spilled += 1
+                except Exception as e:
+                    print(f"❌ Error spilling session of user {user_id}: {e}")
+    
+    def get_user(self, user_id: int) -> UserSession:
+        """Get or create a user session"""
+        user = self._find_user(user_id)
+        if user is None:
+            self._evict()
+            user = self.users[user_id] = UserSession()
+        return user
+    
+    def get_stats(self):
+        """Get session count and eviction counters"""
+        return {
+            "sessions": len(self.users),
+            "evicted_idle": self.evicted_idle,
+            "evicted_capacity": self.evicted_capacity,
+            "spilled": self.spilled,
+            "restored": self.restored
+        }
+    
+    def set_user_role(self, user_id: int, role: str) -> bool:
+        """Set user's selected role"""
+        try:
+            if role in ROLES:
+                user = self.get_user(user_id)
+                user.role = role
+                self._changed(user_id)
+                print(f"✅ User {user_id} role changed to: {role}")
+                return True
+            else:
+                print(f"❌ Invalid role '{role}' for user {user_id}")
+                return False
+        except Exception as e:
+            print(f"❌ Error setting role for user {user_id}: {e}")
+            return False
+    
+    def get_user_role(self, user_id: int) -> str:
+        """Get user's current role"""
+        user = self._find_user(user_id)
+        return user.role if user else DEFAULT_ROLE
+    
+    def add_message(self, user_id: int, role: str, content: str):
+        """Add a message to user's conversation history"""
+        user = self.get_user(user_id)
+        # The ring buffer keeps only the last messages to prevent memory issues;
+        # how much of this is sent to the API is decided by the context token budget
+        if user.history is None:
+            user.history = deque(maxlen=MAX_HISTORY_MESSAGES)
+        user.history.append(ChatMessage(MessageRole(role), content))
+        self._changed(user_id)
+    
+    def get_conversation(self, user_id: int) -> List[ChatMessage]:
+        """Get user's conversation history"""
+        user = self._find_user(user_id)
+        return list(user.history) if user and user.history else []
+    
+    def clear_conversation(self, user_id: int):
+        """Clear user's conversation history"""
+        user = self._find_user(user_id)
+        if user:
+            user.history = None
+            user.summary = None
+            self._changed(user_id)
+    
+    def get_summary(self, user_id: int) -> Optional[str]:
+        """Get the rolling summary of older conversation turns"""
+        user = self._find_user(user_id)
+        return user.summary if user else None
+    
+    def fold_conversation(self, user_id: int, folded: List[ChatMessage], summary: str) -> bool:
+        """
+        Replace the folded messages at the start of the conversation with a summary.
+        Returns False if the conversation changed (e.g. was cleared) in the meantime.
+        """
+        user = self.users.get(user_id)
+        if user is None:
+            return False
+        conversation = list(user.history) if user.history else []
+        for index, message in enumerate(conversation):
+            if message is folded[-1]:
+                user.history = deque(conversation[index + 1:], maxlen=MAX_HISTORY_MESSAGES)
+                user.summary = summary
+                self._changed(user_id)
+                return True
+        return False
+    
+    def set_user_name(self, user_id: int, name: str):
+        """Set user's name"""
+        user = self.get_user(user_id)
+        user.name = name
+        self._changed(user_id)
+    
+    def get_user_name(self, user_id: int) -> Optional[str]:
+        """Get user's name"""
+        user = self._find_user(user_id)
+        return user.name if user else None
+    
+    def set_partner_name(self, user_id: int, partner_name: str):
+        """Set partner name for partner roles"""
+        user = self.get_user(user_id)
+        user.partner_name = partner_name
+        self._changed(user_id)
+        print(f"✅ User {user_id} partner name set to: {partner_name}")
+    
+    def get_partner_name(self, user_id: int) -> Optional[str]:
+        """Get partner name for partner roles"""
+        user = self._find_user(user_id)
+        return user.partner_name if user else None
+    
+    def clear_partner_name(self, user_id: int):
+        """Clear partner name when switching away from partner roles"""
+        user = self.get_user(user_id)
+        user.partner_name = None
+        self._changed(user_id)
+        print(f"✅ User {user_id} partner name cleared")
+    
+    def get_available_roles(self) -> Dict[str, Dict]:
+        """Get all available roles"""
         return ROLES 
\ No newline at end of file